@@ -0,0 +1,310 @@
+"""Offline postal-code / English-address index built from the public road-name address data.
+
+Build it once from the downloaded dataset files (pipe, comma or tab separated,
+CP949 or UTF-8), then point the app at the .sqlite file:
+
+    python address_index.py build seoul.txt busan.txt --index address_index.sqlite
+
+Files with a header row are mapped by column name (see FIELD_ALIASES). For
+header-less files give the 0-based column of each field, e.g.
+--columns sido=0,sigungu=1,road=2,building_main=3,building_sub=4,zip_code=5,road_en=6,sigungu_en=7,sido_en=8
+(check the layout document shipped with the download). Lookups are keyed by the normalized
+"시도 | 시군구 | 도로명 | 건물번호" of a road-name address.
+
+When the files also have the lot-number columns (법정읍면동명, 법정리명, 산여부,
+지번본번, 지번부번, as in the building data files), every building is indexed
+a second time under "시도 | 시군구 | 읍면동리 | 지번", so lot-number (지번)
+addresses such as "서울특별시 강남구 역삼동 737" are found too. Without them
+those addresses miss and go to NCP; AddressIndex counts them separately
+(lot_misses) so the run summary shows how many there were.
+"""
+import argparse
+import csv
+import os
+import re
+import sqlite3
+import sys
+import threading
+from logger import logger
+
+DEFAULT_INDEX_PATH = "address_index.sqlite"
+
+# Header names accepted for each field (matched after removing spaces, case-insensitive)
+FIELD_ALIASES = {
+    "sido": ("시도명", "시도", "sido"),
+    "sigungu": ("시군구명", "시군구", "sigungu"),
+    "road": ("도로명", "road", "road_name"),
+    "building_main": ("건물본번", "건물번호본번", "building_main"),
+    "building_sub": ("건물부번", "건물번호부번", "building_sub"),
+    "zip_code": ("우편번호", "기초구역번호", "새우편번호", "zip_code", "zipcode"),
+    "english_address": ("영문주소", "english_address"),
+    "sido_en": ("시도명영문", "영문시도명", "sido_en"),
+    "sigungu_en": ("시군구명영문", "영문시군구명", "sigungu_en"),
+    "road_en": ("도로명영문", "영문도로명", "road_en"),
+    "dong": ("법정읍면동명", "읍면동명", "법정동명", "dong"),
+    "ri": ("법정리명", "리명", "ri"),
+    "mountain": ("산여부", "mountain"),
+    "lot_main": ("지번본번", "lot_main"),
+    "lot_sub": ("지번부번", "lot_sub"),
+}
+REQUIRED_FIELDS = ("sido", "sigungu", "road", "building_main", "zip_code")
+
+# Old and new names of each province map to one short form (강원도 and 강원특별자치도 are both 강원)
+SIDO_SHORT = {
+    "서울특별시": "서울", "서울시": "서울", "부산광역시": "부산", "부산시": "부산", "대구광역시": "대구",
+    "대구시": "대구", "인천광역시": "인천", "인천시": "인천", "광주광역시": "광주", "대전광역시": "대전",
+    "대전시": "대전", "울산광역시": "울산", "울산시": "울산", "세종특별자치시": "세종", "세종시": "세종",
+    "경기도": "경기", "강원도": "강원", "강원특별자치도": "강원", "충청북도": "충북", "충청남도": "충남",
+    "전라북도": "전북", "전북특별자치도": "전북", "전라남도": "전남", "경상북도": "경북", "경상남도": "경남",
+    "제주특별자치도": "제주", "제주도": "제주",
+}
+
+_ROAD_RE = re.compile(r"^(\S*?\d*(?:로|길))(\d+(?:-\d+)?)?$")
+_NUMBER_RE = re.compile(r"^(?:지하\s*)?(\d+)(?:-(\d+))?(?:번지)?$")
+_LOT_NUMBER_RE = re.compile(r"^(산\s*)?(\d+)(?:-(\d+))?(?:번지)?$")
+
+def short_sido(token):
+    return SIDO_SHORT.get(token, token)
+
+def _number(main, sub=""):
+    sub = str(sub or "").strip()
+    return f"{int(main)}-{int(sub)}" if sub and sub != "0" else f"{int(main)}"
+
+def make_key(sido, sigungu, road, building_main, building_sub=""):
+    return "|".join((short_sido(sido.strip()), "".join(sigungu.split()), "".join(road.split()),
+                     _number(building_main, building_sub)))
+
+def make_lot_key(sido, sigungu, dong, ri, lot_main, lot_sub="", mountain=False):
+    """Key of a lot-number address; dong and ri are joined ("양평읍" + "양근리"), 산 lots get a 산 prefix."""
+    return "|".join((short_sido(sido.strip()), "".join(sigungu.split()), "".join(f"{dong} {ri or ''}".split()),
+                     ("산" if mountain else "") + _number(lot_main, lot_sub)))
+
+def address_key(address):
+    """Normalized key of a free-form road-name address, or None if it does not look like one.
+
+    Handles "서울특별시 강남구 테헤란로 152", "서울 강남구 테헤란로152, 3층 (역삼동)",
+    "경기도 수원시 영통구 광교로 1" and similar; 읍/면 tokens are skipped.
+    """
+    if not address or not isinstance(address, str):
+        return None
+    text = re.sub(r"\(.*?\)", " ", address).split(",")[0]
+    tokens = text.split()
+    if len(tokens) < 3:
+        return None
+    for i, token in enumerate(tokens[1:], 1):
+        match = _ROAD_RE.match(token)
+        if not match:
+            continue
+        road, number = match.groups()
+        if number is None and i + 1 < len(tokens):
+            number = tokens[i + 1]
+        number_match = _NUMBER_RE.match(number or "")
+        if not number_match:
+            return None
+        sigungu = "".join(t for t in tokens[1:i] if t.endswith(("시", "군", "구")))
+        return make_key(tokens[0], sigungu, road, number_match.group(1), number_match.group(2))
+    return None
+
+def lot_key(address):
+    """Normalized key of a free-form lot-number (지번) address, or None if it does not look like one.
+
+    A 동/리/가 token followed by a lot number: "서울특별시 강남구 역삼동 737",
+    "경기도 양평군 양평읍 양근리 산 12-3번지" and similar.
+    """
+    if not address or not isinstance(address, str):
+        return None
+    tokens = re.sub(r"\(.*?\)", " ", address).split(",")[0].split()
+    for i, token in enumerate(tokens[1:-1], 1):
+        if not token.endswith(("동", "리", "가")):
+            continue
+        number = tokens[i + 1]
+        if number == "산" and i + 2 < len(tokens):
+            number = "산" + tokens[i + 2]
+        match = _LOT_NUMBER_RE.match(number)
+        if not match:
+            continue
+        region = tokens[1:i + 1]
+        sigungu = "".join(t for t in region if t.endswith(("시", "군", "구")))
+        dong = "".join(t for t in region if t.endswith(("읍", "면", "동", "가", "리")))
+        return make_lot_key(tokens[0], sigungu, dong, "", match.group(2), match.group(3), bool(match.group(1)))
+    return None
+
+def compose_english(row):
+    """NCP-style English address ("152 Teheran-ro, Gangnam-gu, Seoul") from the English name columns."""
+    if row.get("english_address"):
+        return row["english_address"].strip()
+    if not (row.get("road_en") and row.get("sido_en")):
+        return ""
+    number = _number(row["building_main"], row.get("building_sub"))
+    parts = [f"{number} {row['road_en'].strip()}", (row.get("sigungu_en") or "").strip(), row["sido_en"].strip()]
+    return ", ".join(part for part in parts if part)
+
+class AddressIndex:
+    """Read side of the index: address -> (zip_code, english_address)."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Address index not found: {path}")
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.lot_misses = 0  # lot-number addresses not in the index (also in misses)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        count = self._conn.execute("SELECT COUNT(*) FROM address").fetchone()[0]
+        logger.info("Address index opened: %s (%s keys)", path, count)
+
+    def lookup(self, address):
+        """Returns (zip_code, english_address) for a road-name or lot-number address, or None when it is not indexed.
+
+        An entry with neither a zip code nor an English address counts as a miss and returns None.
+        """
+        key = address_key(address)
+        lot = False
+        if key is None:
+            key = lot_key(address)
+            lot = key is not None
+        row = None
+        with self._lock:
+            if key is not None:
+                row = self._conn.execute("SELECT zip_code, english_address FROM address WHERE key = ?",
+                                         (key,)).fetchone()
+            if row is not None and not any(row):
+                row = None
+            if row is None:
+                self.misses += 1
+                self.lot_misses += lot
+            else:
+                self.hits += 1
+        if lot and row is None:
+            logger.debug("Address index: lot-number address not indexed, using NCP: %s", address)
+        return row
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        logger.info("Address index closed (hits=%s, misses=%s, lot-number misses=%s)",
+                    self.hits, self.misses, self.lot_misses)
+
+def _resolve_header(header):
+    names = [re.sub(r"[\s_()]+", "", h).lower() for h in header]
+    columns = {}
+    for field, aliases in FIELD_ALIASES.items():
+        aliases = tuple(re.sub(r"[\s_()]+", "", a).lower() for a in aliases)
+        match = next((i for i, name in enumerate(names) if name in aliases), None)
+        if match is not None:
+            columns[field] = match
+    return columns
+
+def parse_columns(spec):
+    """'sido=1,road=4,...' (0-based column numbers) -> {field: index}."""
+    columns = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        field, _, index = item.partition("=")
+        if field not in FIELD_ALIASES:
+            raise ValueError(f"Unknown address field '{field}' (expected one of {sorted(FIELD_ALIASES)})")
+        columns[field] = int(index)
+    return columns
+
+def _row_keys(row):
+    """The road-name key of a dataset row, plus its lot-number key when the lot columns are filled."""
+    keys = [make_key(row["sido"], row["sigungu"], row["road"], row["building_main"], row.get("building_sub"))]
+    if (row.get("dong") or "").strip() and (row.get("lot_main") or "").strip():
+        try:
+            keys.append(make_lot_key(row["sido"], row["sigungu"], row["dong"], row.get("ri"), row["lot_main"],
+                                     row.get("lot_sub"), (row.get("mountain") or "").strip() == "1"))
+        except ValueError:
+            pass  # an unreadable lot number still leaves the road-name key
+    return keys
+
+def _import_file(conn, path, text, columns, delimiter):
+    """Inserts one dataset file read from the open text stream; returns the number of unreadable lines."""
+    sample = text.read(4096)
+    text.seek(0)
+    sep = delimiter or max("|,\t", key=sample.count)
+    reader = csv.reader(text, delimiter=sep, quoting=csv.QUOTE_NONE if sep == "|" else csv.QUOTE_MINIMAL)
+    if columns is None:
+        columns = _resolve_header(next(reader, []))
+    missing = [field for field in REQUIRED_FIELDS if field not in columns]
+    if missing:
+        raise ValueError(f"{path}: no column for {missing}; pass columns= (--columns) for header-less files")
+
+    skipped = 0
+    batch = []
+    for values in reader:
+        try:
+            row = {field: values[index] for field, index in columns.items()}
+            zip_code, english = row["zip_code"].strip(), compose_english(row)
+            batch.extend((key, zip_code, english) for key in _row_keys(row))
+        except (IndexError, ValueError):
+            skipped += 1
+            continue
+        if len(batch) >= 10000:
+            conn.executemany("INSERT OR REPLACE INTO address VALUES (?, ?, ?)", batch)
+            batch = []
+    conn.executemany("INSERT OR REPLACE INTO address VALUES (?, ?, ?)", batch)
+    logger.info("Address index: imported %s (separator %r)", path, sep)
+    return skipped
+
+def build_index(dataset_paths, index_path=DEFAULT_INDEX_PATH, columns=None, delimiter=None, encoding=None):
+    """Compiles dataset files into the SQLite index (rebuilt from scratch); returns the key count.
+
+    Files are streamed, never read whole. Without an encoding each file is tried as
+    UTF-8 first and then CP949 (the published files use CP949); a file that fails
+    to decode part-way is rolled back and imported again with the next encoding.
+    """
+    partial = index_path + ".part"
+    if os.path.exists(partial):
+        os.remove(partial)
+    conn = sqlite3.connect(partial)
+    conn.execute("CREATE TABLE address (key TEXT PRIMARY KEY, zip_code TEXT NOT NULL, "
+                 "english_address TEXT NOT NULL) WITHOUT ROWID")
+    skipped = 0
+    for path in dataset_paths:
+        for candidate in ([encoding] if encoding else ["utf-8-sig", "cp949"]):
+            try:
+                with open(path, "r", encoding=candidate, newline="") as text:
+                    file_skipped = _import_file(conn, path, text, columns, delimiter)
+            except UnicodeDecodeError:
+                conn.rollback()
+                continue
+            conn.commit()
+            skipped += file_skipped
+            break
+        else:
+            conn.close()
+            raise ValueError(f"Cannot decode {path} as {encoding or 'UTF-8 or CP949'}")
+
+    count = conn.execute("SELECT COUNT(*) FROM address").fetchone()[0]
+    conn.execute("VACUUM")
+    conn.close()
+    os.replace(partial, index_path)
+    logger.info("Address index built: %s (%s keys, %s unreadable lines skipped)", index_path, count, skipped)
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the offline address index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Compile dataset files into the index")
+    build.add_argument("datasets", nargs="+")
+    build.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    build.add_argument("--columns", help="field=column pairs (0-based) for files without a header row")
+    build.add_argument("--delimiter", help="Column separator (default: detected)")
+    build.add_argument("--encoding", help="File encoding (default: UTF-8, then CP949)")
+    query = commands.add_parser("lookup", help="Look up addresses in an existing index")
+    query.add_argument("addresses", nargs="+")
+    query.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        columns = parse_columns(args.columns) if args.columns else None
+        print(build_index(args.datasets, args.index, columns, args.delimiter, args.encoding))
+    else:
+        index = AddressIndex(args.index)
+        for address in args.addresses:
+            print(f"{address}\t{address_key(address) or lot_key(address)}\t{index.lookup(address)}")
+        index.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
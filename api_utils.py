@@ -1,60 +1,285 @@
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 import requests
-from korean_romanizer.romanizer import Romanizer
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
 from logger import logger
+from enrichment_cache import EnrichmentCache
+from romanization import RomanizationService
+from profiler import NULL_PROFILER
+from place_match import PlaceRanker
+
+NCP_GEOCODE_URL = "https://maps.apigw.ntruss.com/map-geocode/v2/geocode"
+KAKAO_KEYWORD_URL = "https://dapi.kakao.com/v2/local/search/keyword.json"
+KAKAO_MODES = ("ranked", "sequential")
+
+class ProviderLimiter:
+    """Caps one provider at max_concurrency requests in flight and rate_per_sec starts per second."""
+
+    def __init__(self, rate_per_sec, max_concurrency):
+        self._interval = 1.0 / rate_per_sec if rate_per_sec else 0.0
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._slots.release()
+        return False
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+class CircuitBreaker:
+    """Run-wide health of one provider.
+
+    Closed: calls go through. After failure_threshold consecutive failures
+    (timeouts/5xx that survived their retries), or at once on 401/403/429, the
+    circuit opens and calls raise ProviderUnavailable without touching the
+    network. When the cooldown (or the server's Retry-After) has passed, one
+    caller is let through as a probe (half-open): success closes the circuit,
+    failure re-opens it with twice the cooldown, up to max_cooldown.
+    """
+
+    def __init__(self, name, failure_threshold=5, cooldown=30.0, max_cooldown=600.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = "closed"
+        self.trips = 0
+        self.rejected = 0
+        self.auth_error = None  # last 401/403 status: the key was rejected
+        self._failures = 0
+        self._cooldown = cooldown
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() >= self._open_until:
+                self.state = "half_open"
+                logger.info("%s circuit half-open: sending a probe request", self.name)
+                return
+            self.rejected += 1
+        raise ProviderUnavailable(f"{self.name} circuit is open")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self.state != "closed":
+                logger.info("%s circuit closed: provider recovered", self.name)
+                self.state = "closed"
+                self._cooldown = self.base_cooldown
+
+    def record_failure(self, reason, open_now=False, retry_after=None, auth_error=None):
+        """Counts a failed call; opens the circuit at the threshold, on open_now, or when a probe fails.
+
+        retry_after (seconds), when known, replaces the cooldown for this opening;
+        auth_error is the 401/403 status when the provider rejected the key.
+        """
+        with self._lock:
+            self._failures += 1
+            if auth_error is not None:
+                self.auth_error = auth_error
+            if not (open_now or self.state == "half_open" or self._failures >= self.failure_threshold):
+                return
+            if self.state == "half_open":
+                self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+            cooldown = self._cooldown if retry_after is None else retry_after
+            self._open_until = time.monotonic() + cooldown
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+        logger.warning("%s circuit open for %.1fs after %s", self.name, cooldown, reason)
+
+    def report(self):
+        return {"state": self.state, "trips": self.trips, "rejected": self.rejected, "auth_error": self.auth_error}
+
+def retry_after_seconds(response):
+    """Retry-After header as seconds (delta-seconds or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
 class APIHandler:
-    def __init__(self, ncp_client_id, ncp_client_secret, kakao_api_key):
+    def __init__(self, ncp_client_id, ncp_client_secret, kakao_api_key, cache=None,
+                 ncp_rps=10, ncp_concurrency=4, kakao_rps=10, kakao_concurrency=4, romanizer=None,
+                 ncp_url=NCP_GEOCODE_URL, kakao_url=KAKAO_KEYWORD_URL, address_index=None,
+                 max_retries=2, backoff_base=0.5, backoff_max=8.0, breaker_threshold=5, breaker_cooldown=30.0,
+                 kakao_mode="ranked", kakao_size=15, match_threshold=0.6):
         self.ncp_client_id = ncp_client_id
         self.ncp_client_secret = ncp_client_secret
         self.kakao_api_key = kakao_api_key
+        # Optional EnrichmentCache; a hit skips both NCP and Kakao entirely
+        self.cache = cache
+        self.romanizer = romanizer or RomanizationService()
+        # Optional offline AddressIndex; a hit answers zip code and English address without NCP
+        self.address_index = address_index
+        # Endpoints are overridable so benchmarks can point at a local stub server
+        self.ncp_url = ncp_url
+        self.kakao_url = kakao_url
+        # HTTP requests made per provider; ExcelHandler swaps in its run profiler for per-call timings
+        self.call_counts = {"ncp": 0, "kakao": 0, "address_index": 0}
+        self._count_lock = threading.Lock()
+        self.profiler = NULL_PROFILER
+
+        # One keep-alive session per provider, pooled for the provider's concurrency cap
+        self.ncp_session = self._make_session(ncp_concurrency, {
+            "X-NCP-APIGW-API-KEY-ID": self.ncp_client_id,
+            "X-NCP-APIGW-API-KEY": self.ncp_client_secret
+        })
+        self.kakao_session = self._make_session(kakao_concurrency, {
+            "Authorization": f"KakaoAK {self.kakao_api_key}"
+        })
+        self.ncp_limiter = ProviderLimiter(ncp_rps, ncp_concurrency)
+        self.kakao_limiter = ProviderLimiter(kakao_rps, kakao_concurrency)
+        # Transient errors (timeouts, 5xx) are retried with jittered exponential backoff;
+        # the breakers stop a dead or throttled provider from being hit by every row
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breakers = {"ncp": CircuitBreaker("NCP", breaker_threshold, breaker_cooldown),
+                         "kakao": CircuitBreaker("Kakao", breaker_threshold, breaker_cooldown)}
+        self.retries = {"ncp": 0, "kakao": 0}
+        self._jitter = random.Random()
+        # "ranked": one size=kakao_size search scored locally, a second request only below
+        # match_threshold; "sequential": the original company+city, then company, size=1 searches
+        if kakao_mode not in KAKAO_MODES:
+            raise ValueError(f"Unknown Kakao lookup mode: {kakao_mode}")
+        self.kakao_mode = kakao_mode
+        self.kakao_size = max(1, min(15, kakao_size))
+        self.ranker = PlaceRanker(match_threshold)
+        # Chosen candidate per store (normalized key -> {score, place, query}) for the audit trail.
+        # Only searches made in the current run are kept, each until pop_match() reports it
+        self.match_scores = {}
+        # Single-flight: concurrent requests for the same store share one lookup
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
         logger.info("APIHandler initialized (NCP + Kakao)")
 
+    @staticmethod
+    def _make_session(pool_size, headers):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(headers)
+        return session
+
+    def _count_call(self, provider):
+        with self._count_lock:
+            self.call_counts[provider] += 1
+
+    def _ncp_get(self, params):
+        return self._request("ncp", self.ncp_session, self.ncp_url, self.ncp_limiter, params)
+
+    def _kakao_get(self, params):
+        return self._request("kakao", self.kakao_session, self.kakao_url, self.kakao_limiter, params)
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return self._jitter.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _request(self, provider, session, url, limiter, params):
+        """GET through the provider's breaker, limiter and retry policy.
+
+        Returns the final response (callers still check the status) or raises
+        ProviderUnavailable / the last transport error.
+        """
+        breaker = self.breakers[provider]
+        attempt = 0
+        while True:
+            breaker.before_call()
+            self._count_call(provider)
+            try:
+                with limiter, self.profiler.stage(provider):
+                    response = session.get(url, params=params, timeout=5)
+            except requests.RequestException as e:
+                breaker.record_failure(type(e).__name__)
+                if attempt >= self.max_retries or breaker.state == "open":
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                status = response.status_code
+                if status in (401, 403):
+                    # A bad or revoked key will not fix itself within the run; probe rarely
+                    breaker.record_failure(f"HTTP {status}", open_now=True, retry_after=breaker.max_cooldown,
+                                           auth_error=status)
+                    return response
+                retry_after = retry_after_seconds(response)
+                if status == 429:
+                    breaker.record_failure("HTTP 429", open_now=True, retry_after=retry_after)
+                    return response
+                if status < 500:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure(f"HTTP {status}", retry_after=retry_after)
+                if attempt >= self.max_retries or breaker.state == "open":
+                    return response
+                delay = self._backoff(attempt, retry_after)
+            attempt += 1
+            with self._count_lock:
+                self.retries[provider] += 1
+            logger.debug("Retrying %s in %.2fs (attempt %s)", provider, delay, attempt + 1)
+            time.sleep(delay)
+
+    def pop_match(self, address, company_name=""):
+        """Audit record of the Kakao candidate chosen for a store in ranked mode, or None.
+
+        The record is removed, so each search is reported once; a cache hit made no search and has none.
+        """
+        return self.match_scores.pop(EnrichmentCache.normalize_key(address, company_name), None)
+
+    def reset_matches(self):
+        """Drops unreported match records; called at the start of every run."""
+        self.match_scores.clear()
+
+    def health_report(self):
+        """{provider: {state, trips, rejected, auth_error, retries}} for the run summary."""
+        return {provider: dict(breaker.report(), retries=self.retries[provider])
+                for provider, breaker in self.breakers.items()}
+
+    def close(self):
+        self.ncp_session.close()
+        self.kakao_session.close()
+
     def get_romanized_text(self, text, is_company=False):
         """Converts Korean text to English Romanization with business naming rules."""
-        try:
-            if not text or not isinstance(text, str) or text.lower() == 'nan':
-                return ""
-            
-            processed_text = text
-            if is_company:
-                # Business naming rules
-                if processed_text.endswith("점"):
-                    processed_text = processed_text[:-1] + " Branch"
-                if processed_text == "본점":
-                    processed_text = "Headquarters"
-                elif "본점" in processed_text:
-                    processed_text = processed_text.replace("본점", " Headquarters")
-
-            r = Romanizer(processed_text)
-            romanized = r.romanize()
-            
-            # Capitalize every word
-            if romanized:
-                romanized = ' '.join(word[0].upper() + word[1:] if word else "" for word in romanized.split())
-                
-            logger.debug(f"Romanized (is_company={is_company}): {text} -> {romanized}")
-            return romanized
-        except Exception as e:
-            logger.error(f"Romanization error for '{text}': {e}", exc_info=True)
-            return text
+        return self.romanizer.romanize(text, is_company)
 
-    def get_enriched_data(self, address, company_name=""):
-        """Fetches Enriched Data: Phone (Kakao), Zip Code (NCP), English Address (NCP)."""
-        logger.info(f"Enriching data for: {address} (Company: {company_name})")
-        phone = ""
+    def _geocode(self, address):
+        """NCP Geocoding; returns (zip_code, english_address, (x, y) or None, failed)."""
         zip_code = ""
         english_address = ""
-
-        # 1. Geocoding API (NCP) for Zip Code and English Address
+        coords = None
+        lookup_failed = False
         try:
-            geo_url = "https://maps.apigw.ntruss.com/map-geocode/v2/geocode"
-            geo_headers = {
-                "X-NCP-APIGW-API-KEY-ID": self.ncp_client_id,
-                "X-NCP-APIGW-API-KEY": self.ncp_client_secret
-            }
             geo_params = {"query": address}
             
-            res_geo = requests.get(geo_url, headers=geo_headers, params=geo_params, timeout=5)
+            res_geo = self._ncp_get(geo_params)
             if res_geo.status_code == 200:
                 data = res_geo.json()
                 addresses = data.get('addresses', [])
@@ -70,44 +295,200 @@ class APIHandler:
                         if 'POSTAL_CODE' in element.get('types', []):
                             zip_code = element.get('longName', '')
                             break
+                    try:
+                        coords = (float(addresses[0]['x']), float(addresses[0]['y']))
+                    except (KeyError, TypeError, ValueError):
+                        coords = None
             else:
-                logger.warning(f"NCP Geocode failed ({res_geo.status_code}): {res_geo.text}")
+                logger.warning("NCP Geocode failed (%s): %s", res_geo.status_code, res_geo.text)
+                lookup_failed = True
+        except ProviderUnavailable as e:
+            logger.debug("NCP Geocode skipped: %s", e)
+            lookup_failed = True
         except Exception as e:
-            logger.error(f"NCP Geocode error: {e}")
+            logger.error("NCP Geocode error: %s", e)
+            lookup_failed = True
+        return zip_code, english_address, coords, lookup_failed
+
+    def _phone_sequential(self, address, company_name):
+        """Original strategy: "company city", then "company", each size=1, first document wins."""
+        phone = ""
+        lookup_failed = False
+        # Extract city/province from address (usually first part)
+        city = address.split()[0] if address else ""
+
+        # Try strategies in order
+        kakao_strategies = [
+            f"{company_name} {city}".strip(), # Strategy 1: Company + City
+            company_name                      # Strategy 2: Company only
+        ]
+
+        for query in kakao_strategies:
+            kakao_params = {"query": query, "size": 1}
+            res_kakao = self._kakao_get(kakao_params)
+            logger.debug("Kakao Search (%s) response: %s", query, res_kakao.status_code)
+
+            if res_kakao.status_code == 200:
+                documents = res_kakao.json().get('documents', [])
+                if documents:
+                    phone = documents[0].get('phone', '')
+                    logger.debug("Found phone via Kakao ('%s'): %s", query, phone)
+                    break # Found results, stop
+                else:
+                    logger.debug("No results for Kakao search: %s", query)
+            else:
+                logger.warning("Kakao Search failed (%s): %s", res_kakao.status_code, res_kakao.text)
+                lookup_failed = True
+                if res_kakao.status_code in [401, 403, 429]:
+                    break
+        return phone, lookup_failed
+
+    def _kakao_search(self, params):
+        """Kakao keyword search; returns the documents, or None when the request failed."""
+        res_kakao = self._kakao_get(params)
+        logger.debug("Kakao Search (%s) response: %s", params["query"], res_kakao.status_code)
+        if res_kakao.status_code != 200:
+            logger.warning("Kakao Search failed (%s): %s", res_kakao.status_code, res_kakao.text)
+            return None
+        return res_kakao.json().get('documents', [])
+
+    def _phone_ranked(self, address, company_name, coords):
+        """One wide search ranked locally; a second one (near the geocoded point when known) only
+        if no candidate reaches the ranker's threshold. Returns (phone, failed)."""
+        city = address.split()[0] if address else ""
+        queries = [{"query": f"{company_name} {city}".strip(), "size": self.kakao_size}]
+        if coords is not None:
+            queries.append({"query": company_name, "size": self.kakao_size, "x": coords[0], "y": coords[1],
+                            "radius": 20000})
+        else:
+            queries.append({"query": company_name, "size": self.kakao_size})
+
+        best, best_score, best_query = None, 0.0, None
+        for params in queries:
+            documents = self._kakao_search(params)
+            if documents is None:
+                return "", True
+            document, score = self.ranker.best(company_name, address, documents, coords)
+            if document is not None and score > best_score:
+                best, best_score, best_query = document, score, params["query"]
+            if best_score >= self.ranker.threshold:
+                break
+
+        key = EnrichmentCache.normalize_key(address, company_name)
+        if best is None or best_score < self.ranker.threshold:
+            logger.debug("No Kakao candidate for %s reached %.2f (best %.2f)", company_name,
+                         self.ranker.threshold, best_score)
+            self.match_scores[key] = {"score": best_score, "place": best.get("place_name") if best else None,
+                                      "query": best_query, "accepted": False}
+            return "", False
+        self.match_scores[key] = {"score": best_score, "place": best.get("place_name"), "query": best_query,
+                                  "accepted": True}
+        logger.debug("Kakao match for %s: %s (score %.2f)", company_name, best.get("place_name"), best_score)
+        return best.get("phone", ""), False
+
+    def get_enriched_data(self, address, company_name=""):
+        """Fetches Enriched Data: Phone (Kakao), Zip Code and English Address (address index or NCP)."""
+        if self.cache is not None:
+            cached = self.cache.get(address, company_name)
+            if cached is not None:
+                logger.debug("Enrichment cache hit for: %s (Company: %s)", address, company_name)
+                return cached
+
+        logger.debug("Enriching data for: %s (Company: %s)", address, company_name)
+        phone = ""
+        # Only definitive answers are cached; transport/API errors must be retried next run
+        lookup_failed = False
+
+        # 1. Offline address index first; Geocoding API (NCP) only for what it cannot answer
+        coords = None
+        zip_code, english_address = "", ""
+        if self.address_index is not None:
+            with self.profiler.stage("address_index"):
+                local = self.address_index.lookup(address)
+            if local is not None:
+                self._count_call("address_index")
+                zip_code, english_address = local
+                logger.debug("Address index hit for: %s", address)
+        if not (zip_code and english_address):
+            # e.g. a dataset without English columns: the index zip code stays even if NCP fails
+            ncp_zip, ncp_english, coords, lookup_failed = self._geocode(address)
+            zip_code = zip_code or ncp_zip
+            english_address = english_address or ncp_english
 
         # 2. Kakao Local Search for Phone
         if company_name:
             try:
-                # Extract city/province from address (usually first part)
-                city = address.split()[0] if address else ""
-                
-                kakao_url = "https://dapi.kakao.com/v2/local/search/keyword.json"
-                kakao_headers = {"Authorization": f"KakaoAK {self.kakao_api_key}"}
-                
-                # Try strategies in order
-                kakao_strategies = [
-                    f"{company_name} {city}".strip(), # Strategy 1: Company + City
-                    company_name                      # Strategy 2: Company only
-                ]
-
-                for query in kakao_strategies:
-                    kakao_params = {"query": query, "size": 1}
-                    res_kakao = requests.get(kakao_url, headers=kakao_headers, params=kakao_params, timeout=5)
-                    logger.debug(f"Kakao Search ({query}) response: {res_kakao.status_code}")
-                    
-                    if res_kakao.status_code == 200:
-                        documents = res_kakao.json().get('documents', [])
-                        if documents:
-                            phone = documents[0].get('phone', '')
-                            logger.info(f"Found phone via Kakao ('{query}'): {phone}")
-                            break # Found results, stop
-                        else:
-                            logger.info(f"No results for Kakao search: {query}")
-                    else:
-                        logger.warning(f"Kakao Search failed ({res_kakao.status_code}): {res_kakao.text}")
-                        if res_kakao.status_code in [401, 403]:
-                            break
+                if self.kakao_mode == "ranked":
+                    phone, kakao_failed = self._phone_ranked(address, company_name, coords)
+                else:
+                    phone, kakao_failed = self._phone_sequential(address, company_name)
+                lookup_failed = lookup_failed or kakao_failed
+            except ProviderUnavailable as e:
+                logger.debug("Kakao Search skipped: %s", e)
+                lookup_failed = True
             except Exception as e:
-                logger.error(f"Kakao Search error: {e}")
+                logger.error("Kakao Search error: %s", e)
+                lookup_failed = True
+
+        if self.cache is not None and not lookup_failed:
+            self.cache.put(address, company_name, phone, zip_code, english_address)
 
         return phone, zip_code, english_address
+
+    def enrich_many(self, pairs, max_workers=8, progress=None, cancel_event=None):
+        """Enriches (address, company_name) pairs concurrently; results keep the input order.
+
+        progress(done, total) is called as lookups finish (from worker threads).
+        Once cancel_event is set, lookups that have not started yet return empty results.
+        """
+        pairs = list(pairs)
+        total = len(pairs)
+
+        def enrich(pair):
+            if cancel_event is not None and cancel_event.is_set():
+                return "", "", ""
+            return self.enrich_once(*pair)
+
+        if max_workers <= 1 or total <= 1:
+            results = []
+            for pair in pairs:
+                results.append(enrich(pair))
+                if progress:
+                    progress(len(results), total)
+            return results
+
+        logger.info("Enriching %s rows with %s workers", total, max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="enrich") as pool:
+            futures = [pool.submit(enrich, pair) for pair in pairs]
+            for done, _ in enumerate(as_completed(futures), 1):
+                if progress:
+                    progress(done, total)
+            return [future.result() for future in futures]
+
+    def enrich_once(self, address, company_name=""):
+        """get_enriched_data with single-flight semantics: callers racing on the same key wait for one lookup."""
+        key = EnrichmentCache.normalize_key(address, company_name)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._enrich_safe((address, company_name))
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _enrich_safe(self, pair):
+        address, company_name = pair
+        try:
+            return self.get_enriched_data(address, company_name)
+        except Exception as e:
+            logger.error("Enrichment failed for %s (%s): %s", address, company_name, e, exc_info=True)
+            return "", "", ""
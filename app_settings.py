@@ -0,0 +1,59 @@
+import json
+import os
+from logger import logger
+
+SETTINGS_FILE = "settings.json"
+
+# Tuning knobs persisted in settings.json (edit the file to change them)
+PERFORMANCE_DEFAULTS = {
+    "cache_ttl_days": 30,
+    "cache_negative_ttl_days": 3,
+    "cache_max_entries": 50000,
+    "enrich_workers": 8,
+    "ncp_rps": 10,
+    "ncp_concurrency": 4,
+    "kakao_rps": 10,
+    "kakao_concurrency": 4,
+    "kakao_lookup": "ranked",
+    "kakao_page_size": 15,
+    "kakao_match_threshold": 0.6,
+    "api_max_retries": 2,
+    "circuit_failure_threshold": 5,
+    "circuit_cooldown_seconds": 30,
+    "render_workers": os.cpu_count() or 1,
+    "pipeline": True,
+    "pipeline_enrich_queue": 64,
+    "pipeline_render_queue": 16,
+    "pipeline_write_queue": 16,
+    "source_reader": "pandas",
+    "address_index_path": None,
+    "render_engine": "openpyxl",
+    "output_mode": "files",
+    "bundle_index": True,
+    "profile": False,
+    "resume_runs": True,
+    "signature_seed": None,
+}
+
+def pipeline_queues(perf):
+    """The ExcelHandler pipeline_queues dict from the performance settings."""
+    return {"enrich": perf["pipeline_enrich_queue"], "render": perf["pipeline_render_queue"],
+            "write": perf["pipeline_write_queue"]}
+
+def load_settings(path=SETTINGS_FILE):
+    """Returns the saved settings dict, or {} if the file is missing or unreadable."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error("Failed to load settings: %s", e)
+        return {}
+
+def save_settings(settings, path=SETTINGS_FILE):
+    try:
+        with open(path, "w") as f:
+            json.dump(settings, f)
+    except Exception as e:
+        logger.error("Failed to save settings: %s", e)
@@ -0,0 +1,183 @@
+import csv
+import os
+import shutil
+import time
+from datetime import datetime
+from logger import logger
+from run_manifest import resume_dir
+
+BATCH_REPORT_NAME = "batch_report.csv"
+REPORT_COLUMNS = ("source", "status", "rows", "files", "failed", "rejected", "skipped", "output", "elapsed_seconds",
+                  "error")
+SOURCE_EXTENSIONS = (".xlsx", ".xls")
+# Watch mode moves handled workbooks here (inside the inbox) so they are not picked up again
+DONE_DIR = "done"
+FAILED_DIR = "failed"
+
+def is_source_file(name):
+    """True for workbooks, False for Excel lock files (~$...) and other files."""
+    return name.lower().endswith(SOURCE_EXTENSIONS) and not name.startswith(("~$", "."))
+
+class BatchRunner:
+    """Runs many source workbooks through one warm ExcelHandler.
+
+    The handler keeps its parsed template, signature pool and render pool
+    (keep_warm=True) and its APIHandler keeps the HTTP sessions, circuit
+    breakers and enrichment cache, so each extra workbook only costs its own
+    rows. Every source gets its own subfolder (or zip) under output_root, named
+    after the workbook, so re-running a source resumes into the same place.
+    After every source the consolidated batch_report.csv in output_root is
+    rewritten and the summary of each source is kept in self.results.
+    """
+
+    def __init__(self, handler, output_root):
+        self.handler = handler
+        self.output_root = output_root
+        self.results = []
+        self._outputs = {}  # source path -> output folder, unique within the batch
+
+    def output_dir_for(self, source_path):
+        source_path = os.path.abspath(source_path)
+        if source_path not in self._outputs:
+            self._outputs[source_path] = resume_dir(self.output_root, source_path, set(self._outputs.values()))
+        return self._outputs[source_path]
+
+    def run_source(self, source_path):
+        """Processes one workbook; returns its report entry (a failure is recorded, not raised)."""
+        output_dir = self.output_dir_for(source_path)
+        os.makedirs(self.output_root, exist_ok=True)
+        self.handler.source_path = source_path
+        self.handler.output_dir = output_dir
+        entry = {"source": os.path.abspath(source_path), "status": "ok", "output": os.path.abspath(output_dir)}
+        started = time.perf_counter()
+        try:
+            if not os.path.isfile(source_path):
+                raise FileNotFoundError(f"Source workbook not found: {source_path}")
+            self.handler.process()
+            summary = dict(self.handler.summary)
+            entry["summary"] = summary
+            entry["output"] = os.path.abspath(summary.get("archive") or output_dir)
+            if summary.get("cancelled"):
+                entry["status"] = "cancelled"
+            elif summary.get("failed", 0):
+                entry["status"] = "partial"
+        except Exception as e:
+            logger.error("Batch: %s failed: %s", source_path, e)
+            entry.update(status="error", error=str(e))
+        entry["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        self.results.append(entry)
+        logger.info("Batch: %s -> %s (%s, %.1fs)", os.path.basename(source_path), entry["output"],
+                    entry["status"], entry["elapsed_seconds"])
+        self.write_report()
+        return entry
+
+    def run(self, source_paths):
+        """Processes the workbooks in order; stops early when the handler is cancelled."""
+        for source_path in source_paths:
+            if self.handler.cancelled:
+                break
+            self.run_source(source_path)
+        return self.report()
+
+    def watch(self, inbox, interval=5.0, settle_seconds=2.0, idle_exit=None):
+        """Processes workbooks as they appear in inbox until cancelled (or idle for idle_exit seconds).
+
+        A file is picked up once its size and modification time have not changed
+        for settle_seconds (so half-copied files are left alone), then moved to
+        inbox/done or inbox/failed. A file that cannot be moved (e.g. still open
+        in Excel on Windows) is skipped until its size or mtime changes, so it is
+        not processed again on every scan.
+        """
+        logger.info("Batch: watching %s (every %ss)", inbox, interval)
+        seen = {}  # name -> (size, mtime, first time that state was seen)
+        stuck = {}  # name -> (size, mtime) of a processed file that could not be moved away
+        idle_since = time.monotonic()
+        while not self.handler.cancelled:
+            now = time.monotonic()
+            ready = []
+            for name in sorted(os.listdir(inbox)):
+                path = os.path.join(inbox, name)
+                if not is_source_file(name) or not os.path.isfile(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # moved away in the meantime
+                state = (stat.st_size, stat.st_mtime)
+                if name in stuck:
+                    if stuck[name] == state:
+                        continue
+                    del stuck[name]  # changed since it was processed: a new version to pick up
+                if seen.get(name, (None, None, None))[:2] != state:
+                    seen[name] = state + (now,)
+                elif now - seen[name][2] >= settle_seconds:
+                    ready.append(path)
+            for path in ready:
+                if self.handler.cancelled:
+                    break
+                entry = self.run_source(path)
+                name = os.path.basename(path)
+                state = seen.pop(name)[:2]
+                if not self._archive_source(inbox, path, FAILED_DIR if entry["status"] == "error" else DONE_DIR):
+                    stuck[name] = state
+            if ready:
+                idle_since = time.monotonic()
+            elif idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                logger.info("Batch: no new files for %ss, stopping", idle_exit)
+                break
+            self.handler.cancel_token.wait(interval)
+        return self.report()
+
+    @staticmethod
+    def _archive_source(inbox, path, folder):
+        """Moves a handled workbook into inbox/<folder>; returns False if it could not be moved."""
+        target_dir = os.path.join(inbox, folder)
+        os.makedirs(target_dir, exist_ok=True)
+        stem, ext = os.path.splitext(os.path.basename(path))
+        target = os.path.join(target_dir, stem + ext)
+        if os.path.exists(target):
+            target = os.path.join(target_dir, f"{stem}_{datetime.now().strftime('%Y%m%d%H%M%S')}{ext}")
+        try:
+            shutil.move(path, target)
+            return True
+        except OSError as e:
+            logger.error("Batch: could not move %s to %s: %s; it is skipped until it changes",
+                         path, target_dir, e)
+            return False
+
+    def report(self):
+        """Totals over every source so far, plus one summary per source."""
+        totals = {"sources": len(self.results)}
+        for status in ("ok", "partial", "error", "cancelled"):
+            totals[status] = sum(1 for entry in self.results if entry["status"] == status)
+        for field in ("rows", "files", "failed", "skipped"):
+            totals[field] = sum(entry.get("summary", {}).get(field, 0) for entry in self.results)
+        totals["elapsed_seconds"] = round(sum(entry["elapsed_seconds"] for entry in self.results), 3)
+        return {"totals": totals, "sources": self.results, "report": os.path.join(self.output_root,
+                                                                                  BATCH_REPORT_NAME)}
+
+    def write_report(self):
+        """Rewrites batch_report.csv (UTF-8 with BOM so Excel shows the Korean file names)."""
+        path = os.path.join(self.output_root, BATCH_REPORT_NAME)
+        try:
+            os.makedirs(self.output_root, exist_ok=True)
+            with open(path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS)
+                writer.writeheader()
+                for entry in self.results:
+                    summary = entry.get("summary", {})
+                    writer.writerow({
+                        "source": entry["source"],
+                        "status": entry["status"],
+                        "rows": summary.get("rows", ""),
+                        "files": summary.get("files", ""),
+                        "failed": summary.get("failed", ""),
+                        "rejected": summary.get("validation", {}).get("rejected_rows", ""),
+                        "skipped": summary.get("skipped", ""),
+                        "output": entry["output"],
+                        "elapsed_seconds": entry["elapsed_seconds"],
+                        "error": entry.get("error", ""),
+                    })
+        except OSError as e:
+            logger.error("Failed to write batch report: %s", e)
+        return path
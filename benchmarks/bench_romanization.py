@@ -0,0 +1,58 @@
+"""Micro-benchmark: per-call Romanizer vs RomanizationService on a 10k-name column.
+
+Usage: python benchmarks/bench_romanization.py [rows] [distinct_names]
+"""
+import os
+import sys
+import random
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from korean_romanizer.romanizer import Romanizer
+from romanization import RomanizationService
+
+BRANDS = ["맛있는치킨", "행복분식", "바다횟집", "황금돼지", "옛날통닭", "청춘포차", "한솥도시락", "김밥천국", "본가설렁탕", "소문난순대"]
+AREAS = ["강남", "서초", "해운대", "수원", "분당", "일산", "종로", "마포", "송파", "동래", "중앙", "역삼"]
+SUFFIXES = ["점", "본점", "", "2호점"]
+
+def make_names(rows, distinct, seed=0):
+    rng = random.Random(seed)
+    pool = list({f"{rng.choice(BRANDS)} {rng.choice(AREAS)}{rng.choice(SUFFIXES)}" for _ in range(distinct * 4)})[:distinct]
+    return pd.Series([rng.choice(pool) for _ in range(rows)])
+
+def legacy_romanize(text):
+    """The original per-call implementation from APIHandler.get_romanized_text."""
+    processed_text = text
+    if processed_text.endswith("점"):
+        processed_text = processed_text[:-1] + " Branch"
+    if processed_text == "본점":
+        processed_text = "Headquarters"
+    elif "본점" in processed_text:
+        processed_text = processed_text.replace("본점", " Headquarters")
+    romanized = Romanizer(processed_text).romanize()
+    return ' '.join(word[0].upper() + word[1:] if word else "" for word in romanized.split())
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    names = make_names(rows, distinct)
+    print(f"{rows} rows, {names.nunique()} distinct names")
+
+    start = time.perf_counter()
+    legacy = names.map(legacy_romanize)
+    legacy_time = time.perf_counter() - start
+
+    service = RomanizationService()
+    start = time.perf_counter()
+    bulk = service.romanize_series(names, is_company=True)
+    bulk_time = time.perf_counter() - start
+
+    assert legacy.tolist() == bulk.tolist(), "romanization results differ"
+    print(f"per-call Romanizer : {legacy_time:.3f}s")
+    print(f"bulk service       : {bulk_time:.3f}s  ({legacy_time / bulk_time:.1f}x)")
+    print(f"cache: {service.cache_info()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Synthetic inputs for the benchmarks: a source workbook, a form and signature images.
+
+Usage: python benchmarks/fixtures.py <out_dir> [rows] [duplicate_ratio]
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+from openpyxl.styles import Border, Side
+from PIL import Image, ImageDraw
+
+BRANDS = ["맛있는치킨", "행복분식", "바다횟집", "황금돼지", "옛날통닭", "청춘포차", "한솥도시락", "김밥천국", "본가설렁탕", "소문난순대"]
+AREAS = ["강남", "서초", "해운대", "수원", "분당", "일산", "종로", "마포", "송파", "동래", "중앙", "역삼"]
+SUFFIXES = ["점", "본점", "", "2호점"]
+CITIES = [("서울특별시", ["강남구", "서초구", "마포구", "종로구", "송파구"]),
+          ("부산광역시", ["해운대구", "동래구", "중구"]),
+          ("경기도", ["수원시 영통구", "성남시 분당구", "고양시 일산동구"])]
+ROADS = ["테헤란로", "강남대로", "세종대로", "해운대로", "중앙대로", "월드컵로", "올림픽로"]
+REPRESENTATIVES = ["김민준", "이서연", "박지훈", "최수아", "정예준", "강하은", "조도윤", "윤지아"]
+
+# Source layout expected by ExcelHandler.process: 5 preamble rows, headers on row 6 (header=5)
+SOURCE_HEADER = ("No", "수거일", "대표자", "상호", "주소", "업종", "수거량")
+
+def make_source(path, rows, duplicate_ratio=0.5, seed=0):
+    """Writes a collection workbook with rows data rows; about duplicate_ratio of them repeat an earlier store."""
+    rng = random.Random(seed)
+    distinct = max(1, round(rows * (1 - duplicate_ratio)))
+    stores = []
+    for i in range(distinct):
+        city, districts = rng.choice(CITIES)
+        name = f"{rng.choice(BRANDS)} {rng.choice(AREAS)}{rng.choice(SUFFIXES)}"
+        if i >= len(BRANDS) * len(AREAS):
+            name = f"{name} {i}"  # keep stores distinct past the name combinations
+        address = f"{city} {rng.choice(districts)} {rng.choice(ROADS)} {rng.randint(1, 500)}"
+        stores.append((rng.choice(REPRESENTATIVES), name, address))
+
+    order = list(range(distinct)) + [rng.randrange(distinct) for _ in range(rows - distinct)]
+    rng.shuffle(order)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("수거실적")
+    ws.append(["폐식용유 수거 실적"])
+    for _ in range(4):
+        ws.append([])
+    ws.append(SOURCE_HEADER)
+    for number, index in enumerate(order, 1):
+        representative, name, address = stores[index]
+        date = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        ws.append([number, date, representative, name, address, "음식점", rng.randint(5, 200)])
+    wb.save(path)
+    return distinct
+
+def make_form(path):
+    """A stand-in for the CORSIA self-declaration form with the merges and borders the fill plan expects."""
+    wb = openpyxl.Workbook()
+    wb.active.title = "Cover"
+    ws = wb.create_sheet("CORSIA")
+    wb.active = 1
+    thin = Side(border_style="thin", color="000000")
+    for row in ws.iter_rows(min_row=1, max_row=29, max_col=7):
+        for cell in row:
+            cell.border = Border(left=thin, top=thin, bottom=thin)
+    for merged in ("A1:F1", "C4:F4", "C5:F5", "C7:F7", "C8:F8", "C12:F12", "C13:F13", "A22:B22", "C22:D22"):
+        ws.merge_cells(merged)
+    ws["A1"] = "Self Declaration"
+    for coord, label in (("A4", "Name"), ("A5", "Address"), ("A7", "Zip"), ("A8", "Phone")):
+        ws[coord] = label
+    ws.column_dimensions["C"].width = 40
+    wb.save(path)
+
+def make_signatures(directory, count=3, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    for i in range(count):
+        img = Image.new("RGB", (600, 100), "white")
+        draw = ImageDraw.Draw(img)
+        points = [(x, 50 + rng.randint(-35, 35)) for x in range(20, 580, 20)]
+        draw.line(points, fill="black", width=4)
+        img.save(os.path.join(directory, f"signature_{i}.png"))
+
+def make_fixtures(out_dir, rows, duplicate_ratio=0.5, seed=0):
+    """Creates source.xlsx, form.xlsx and signatures/ in out_dir; returns their paths and the distinct store count."""
+    os.makedirs(out_dir, exist_ok=True)
+    source = os.path.join(out_dir, "source.xlsx")
+    form = os.path.join(out_dir, "form.xlsx")
+    signatures = os.path.join(out_dir, "signatures")
+    distinct = make_source(source, rows, duplicate_ratio, seed)
+    make_form(form)
+    make_signatures(signatures, seed=seed)
+    return {"source": source, "form": form, "signature_dir": signatures, "distinct_stores": distinct}
+
+if __name__ == "__main__":
+    out = sys.argv[1]
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    ratio = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+    print(make_fixtures(out, rows, ratio))
@@ -0,0 +1,163 @@
+"""End-to-end throughput benchmark for ExcelHandler.process, fully offline.
+
+Generates a synthetic source workbook, starts the stub NCP/Kakao server, runs
+one batch against it and appends the result (rows/sec, peak RSS, per-stage
+times, settings) as one JSON line to the results file, so runs can be
+compared over time.
+
+Usage:
+    python benchmarks/run_benchmark.py --rows 2000 --duplicate-ratio 0.6 --latency-ms 80 --workers 4
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import make_fixtures
+from stub_server import StubServer
+from api_utils import APIHandler
+from enrichment_cache import EnrichmentCache
+from address_index import AddressIndex
+from excel_processor import ExcelHandler, PIPELINE_QUEUES
+
+DEFAULT_RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its largest (finished) render worker, in MB.
+
+    Always {"main": ..., "largest_worker": ...} so results compare across
+    platforms; a value that cannot be measured here is None (on Windows the
+    workers' peak is not available, and the main one needs psutil).
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            own = round(psutil.Process().memory_info().peak_wset / 2 ** 20, 1)
+        except Exception:
+            own = None
+        return {"main": own, "largest_worker": None}
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return {"main": round(own / 2 ** 20, 1), "largest_worker": round(children / 2 ** 20, 1)}
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for ExcelHandler.process")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--duplicate-ratio", dest="duplicate_ratio", type=float, default=0.5,
+                        help="Share of rows that repeat an earlier store (0..1)")
+    parser.add_argument("--latency-ms", dest="latency_ms", type=float, default=50, help="Stub response latency")
+    parser.add_argument("--error-rate", dest="error_rate", type=float, default=0.0, help="Share of stub requests failing")
+    parser.add_argument("--miss-rate", dest="miss_rate", type=float, default=0.1,
+                        help="Share of Kakao searches returning no store")
+    parser.add_argument("--force-status", dest="force_status", action="append", default=[],
+                        metavar="PROVIDER=STATUS", help="Make every request to a provider fail, e.g. kakao=401")
+    parser.add_argument("--workers", type=int, default=1, help="Render worker processes")
+    parser.add_argument("--enrich-workers", dest="enrich_workers", type=int, default=8)
+    parser.add_argument("--batch", action="store_true", help="Whole-batch passes instead of the pipeline")
+    parser.add_argument("--queue", type=int, default=0,
+                        help="Size of every pipeline queue (0 = the defaults)")
+    parser.add_argument("--rps", type=float, default=0, help="Per-provider request rate cap (0 = none)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Per-provider concurrent requests")
+    parser.add_argument("--engine", choices=["openpyxl", "xml"], default="openpyxl")
+    parser.add_argument("--reader", choices=["pandas", "stream"], default="pandas")
+    parser.add_argument("--zip", dest="output_mode", action="store_const", const="zip", default="files")
+    parser.add_argument("--cache", action="store_true", help="Use a (fresh) enrichment cache")
+    parser.add_argument("--kakao-lookup", dest="kakao_lookup", choices=["ranked", "sequential"], default="ranked")
+    parser.add_argument("--address-index", dest="address_index", help="Offline address index consulted before NCP")
+    parser.add_argument("--profile", action="store_true", help="Include the per-stage breakdown (count/p50/p95)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="Free-form note stored with the result")
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="JSON-lines file the result is appended to")
+    parser.add_argument("--keep", help="Keep fixtures and output in this directory instead of a temp dir")
+    return parser
+
+def run_benchmark(args, work_dir):
+    fixtures = make_fixtures(os.path.join(work_dir, "fixtures"), args.rows, args.duplicate_ratio, args.seed)
+    output_dir = os.path.join(work_dir, "output")
+    cache = EnrichmentCache(os.path.join(work_dir, "cache.sqlite")) if args.cache else None
+    address_index = AddressIndex(args.address_index) if args.address_index else None
+    forced_status = {provider: int(status) for provider, _, status in
+                     (item.partition("=") for item in args.force_status)}
+
+    with StubServer(latency_ms=args.latency_ms, error_rate=args.error_rate, miss_rate=args.miss_rate,
+                    seed=args.seed, forced_status=forced_status) as stub:
+        api_handler = APIHandler("bench-id", "bench-secret", "bench-key", cache=cache, address_index=address_index,
+                                 ncp_rps=args.rps, ncp_concurrency=args.concurrency,
+                                 kakao_rps=args.rps, kakao_concurrency=args.concurrency,
+                                 ncp_url=stub.ncp_url, kakao_url=stub.kakao_url, kakao_mode=args.kakao_lookup)
+        handler = ExcelHandler(fixtures["source"], fixtures["form"], fixtures["signature_dir"], api_handler,
+                               enrich_workers=args.enrich_workers, render_workers=args.workers,
+                               pipeline=not args.batch,
+                               pipeline_queues=dict.fromkeys(PIPELINE_QUEUES, args.queue) if args.queue else None,
+                               reader=args.reader, output_dir=output_dir, engine=args.engine,
+                               output_mode=args.output_mode, signature_seed=args.seed, profile=args.profile)
+        started = time.perf_counter()
+        try:
+            files, _ = handler.process()
+        finally:
+            elapsed = time.perf_counter() - started
+            api_handler.close()
+            if cache is not None:
+                cache.close()
+            if address_index is not None:
+                address_index.close()
+        requests_seen = dict(stub.requests)
+
+    summary = handler.summary
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "label": args.label,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("results", "keep")},
+        "rows": summary.get("rows"),
+        "distinct_stores": fixtures["distinct_stores"],
+        "files": files,
+        "failed": summary.get("failed"),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_sec": round(summary.get("rows", 0) / elapsed, 2) if elapsed else None,
+        "stages": summary.get("timings", {}),
+        "peak_rss_mb": peak_rss_mb(),
+        "stub_requests": requests_seen,
+        "api_calls": summary.get("api_calls"),
+        "providers": summary.get("providers"),
+        "kakao_match": summary.get("kakao_match"),
+        "cache": summary.get("cache"),
+        "stage_breakdown": summary.get("stages"),
+    }
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.keep:
+        os.makedirs(args.keep, exist_ok=True)
+        result = run_benchmark(args, args.keep)
+    else:
+        with tempfile.TemporaryDirectory(prefix="excel_bench_") as work_dir:
+            result = run_benchmark(args, work_dir)
+
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Local stand-in for the NCP geocode and Kakao keyword-search APIs.
+
+Responses have the same shape as the real services and are derived from the
+query text, so repeated runs see identical data. Latency and error rate are
+configurable; failed requests get an HTTP 500. forced_status makes every
+request to one provider fail, e.g. {"kakao": 401} for a revoked key or
+{"ncp": 429} for throttling (sent with Retry-After: 1).
+
+Usage: python benchmarks/stub_server.py [port] [latency_ms] [error_rate]
+"""
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+NCP_PATH = "/map-geocode/v2/geocode"
+KAKAO_PATH = "/v2/local/search/keyword.json"
+
+def _digest(text):
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest(), 16)
+
+def geocode_response(query):
+    h = _digest(query)
+    return {
+        "status": "OK",
+        "meta": {"totalCount": 1, "page": 1, "count": 1},
+        "addresses": [{
+            "roadAddress": query,
+            "englishAddress": f"{h % 500 + 1}, Stub-ro, Jung-gu, Seoul, Republic of Korea",
+            "addressElements": [
+                {"types": ["SIDO"], "longName": query.split()[0] if query else "", "shortName": ""},
+                {"types": ["POSTAL_CODE"], "longName": f"{h % 90000 + 1000:05d}", "shortName": ""},
+            ],
+            "x": f"{126.8 + (h % 1000) / 2500:.7f}",
+            "y": f"{37.4 + (h // 1000 % 1000) / 2500:.7f}",
+        }],
+    }
+
+def keyword_response(query, size, miss_rate, x=None, y=None):
+    """The first document is the store itself (query minus a trailing province), the rest are
+    other branches elsewhere; with x/y the store is placed at that point."""
+    h = _digest(query)
+    if (h % 1000) / 1000 < miss_rate:
+        return {"meta": {"total_count": 0, "pageable_count": 0, "is_end": True}, "documents": []}
+    words = query.split()
+    province = words[-1] if len(words) > 1 and words[-1].endswith(("시", "도")) else "서울"
+    name = " ".join(words[:-1]) if province != "서울" or words[-1:] == ["서울"] else query
+    documents = []
+    for i in range(min(size, 3)):
+        hi = _digest(f"{query}#{i}")
+        doc_x, doc_y = f"{126.8 + (hi % 1000) / 2500:.7f}", f"{37.4 + (hi // 1000 % 1000) / 2500:.7f}"
+        if i == 0 and x is not None and y is not None:
+            doc_x, doc_y = x, y
+        documents.append({
+            "id": str(hi % 10 ** 8),
+            "place_name": name if i == 0 else f"{name.split()[0]} {i + 1}호점",
+            "category_name": "음식점",
+            "phone": f"02-{hi % 900 + 100}-{hi // 1000 % 9000 + 1000}",
+            "address_name": f"{province if i == 0 else '제주특별자치도'} 중구 {hi % 300 + 1}",
+            "road_address_name": "",
+            "x": doc_x,
+            "y": doc_y,
+        })
+    return {"meta": {"total_count": len(documents), "pageable_count": len(documents), "is_end": True},
+            "documents": documents}
+
+class StubServer:
+    """Threaded stub HTTP server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, port=0, latency_ms=50, error_rate=0.0, miss_rate=0.1, seed=0, forced_status=None):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.miss_rate = miss_rate
+        self.forced_status = dict(forced_status or {})
+        self.requests = {"ncp": 0, "kakao": 0, "errors": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def ncp_url(self):
+        return self.base_url + NCP_PATH
+
+    @property
+    def kakao_url(self):
+        return self.base_url + KAKAO_PATH
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+            # Headers and body go out in separate writes; with Nagle on, delayed ACKs add ~40 ms per request
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                query = params.get("query", [""])[0]
+                with stub._lock:
+                    fail = stub._rng.random() < stub.error_rate
+                    provider = "ncp" if url.path == NCP_PATH else "kakao"
+                    stub.requests[provider] += 1
+                    if fail:
+                        stub.requests["errors"] += 1
+                time.sleep(stub.latency)
+
+                forced = stub.forced_status.get(provider)
+                if forced:
+                    self._send(forced, {"error": "stub forced status"},
+                               {"Retry-After": "1"} if forced in (429, 503) else None)
+                elif fail:
+                    self._send(500, {"error": "stub failure"})
+                elif url.path == NCP_PATH:
+                    self._send(200, geocode_response(query))
+                elif url.path == KAKAO_PATH:
+                    size = int(params.get("size", ["15"])[0])
+                    self._send(200, keyword_response(query, size, stub.miss_rate,
+                                                     params.get("x", [None])[0], params.get("y", [None])[0]))
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=UTF-8")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 18080
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    error_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    server = StubServer(port, latency, error_rate).start()
+    print(f"Stub NCP:   {server.ncp_url}\nStub Kakao: {server.kakao_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,274 @@
+"""Headless batch entry point (no tkinter/customtkinter).
+
+Example:
+    python cli.py --source collect.xlsx --form form.xlsx --signature-dir sigs --output-dir out/2024-06
+
+With --sources a.xlsx b.xlsx (or --watch INBOX) every workbook is processed
+by the same warm handler into its own subfolder of --output-dir, and a
+consolidated batch_report.csv is written there.
+
+Every option can also come from the environment (see ENV_DEFAULTS) or from a
+settings.json written by the GUI (--settings). Prints a JSON summary on stdout;
+the exit code is 0 when every row produced a file, 1 when some rows failed,
+2 when the run could not complete (or the API keys are missing) and 3 when
+NCP or Kakao rejected its key (HTTP 401/403).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from logger import logger
+from api_utils import APIHandler
+from enrichment_cache import EnrichmentCache, DEFAULT_CACHE_PATH
+from address_index import AddressIndex
+from excel_processor import ExcelHandler
+from batch_runner import BatchRunner
+from app_settings import PERFORMANCE_DEFAULTS, load_settings, pipeline_queues
+
+# option dest -> environment variable
+ENV_DEFAULTS = {
+    "source": "EXCEL_SOURCE_PATH",
+    "form": "EXCEL_FORM_PATH",
+    "signature_dir": "EXCEL_SIGNATURE_DIR",
+    "output_dir": "EXCEL_OUTPUT_DIR",
+    "workers": "EXCEL_WORKERS",
+    "ncp_client_id": "NCP_CLIENT_ID",
+    "ncp_client_secret": "NCP_CLIENT_SECRET",
+    "kakao_api_key": "KAKAO_API_KEY",
+}
+API_KEY_OPTIONS = ("ncp_client_id", "ncp_client_secret", "kakao_api_key")
+EXIT_CODES = {"ok": 0, "partial": 1, "auth_error": 3}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate CORSIA self-declaration forms without the GUI.")
+    parser.add_argument("--source", help="Collection workbook to extract rows from")
+    parser.add_argument("--sources", nargs="+", metavar="SOURCE",
+                        help="Process several workbooks in one warm process, each into <output-dir>/<name>")
+    parser.add_argument("--watch", metavar="INBOX",
+                        help="Process workbooks as they arrive in INBOX (moved to INBOX/done or INBOX/failed)")
+    parser.add_argument("--watch-interval", dest="watch_interval", type=float, default=5.0,
+                        help="Seconds between inbox scans")
+    parser.add_argument("--idle-exit", dest="idle_exit", type=float,
+                        help="Stop watching after this many seconds without new files")
+    parser.add_argument("--form", help="Form (template) workbook")
+    parser.add_argument("--signature-dir", dest="signature_dir", help="Directory of signature images")
+    parser.add_argument("--output-dir", dest="output_dir",
+                        help="Output directory (default: ./<workbook name> when resuming, else ./YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, help="Render worker processes")
+    parser.add_argument("--enrich-workers", dest="enrich_workers", type=int, help="Concurrent enrichment threads")
+    parser.add_argument("--batch", action="store_true",
+                        help="Run lookups, rendering and writing as whole-batch passes instead of the pipeline")
+    parser.add_argument("--reader", choices=["pandas", "stream"],
+                        help="Source reader: pandas loads the whole sheet, stream reads it row by row")
+    parser.add_argument("--engine", choices=["openpyxl", "xml"], help="Render engine")
+    parser.add_argument("--zip", dest="output_mode", action="store_const", const="zip",
+                        help="Write all documents into one <output-dir>.zip instead of separate files")
+    parser.add_argument("--no-index", dest="no_index", action="store_true",
+                        help="Leave the index sheet out of the zip bundle")
+    parser.add_argument("--profile", action="store_true", help="Time every stage and print a summary table")
+    parser.add_argument("--trace", help="With --profile, also export stage events (.json Chrome trace or .jsonl)")
+    parser.add_argument("--ncp-client-id", dest="ncp_client_id")
+    parser.add_argument("--ncp-client-secret", dest="ncp_client_secret")
+    parser.add_argument("--kakao-api-key", dest="kakao_api_key")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Enrichment cache file")
+    parser.add_argument("--no-cache", dest="no_cache", action="store_true", help="Disable the enrichment cache")
+    parser.add_argument("--kakao-lookup", dest="kakao_lookup", choices=["ranked", "sequential"],
+                        help="Kakao phone lookup: one ranked search (default) or the old two size=1 searches")
+    parser.add_argument("--address-index", dest="address_index",
+                        help="Offline address index (built with address_index.py) consulted before NCP")
+    parser.add_argument("--no-resume", dest="no_resume", action="store_true",
+                        help="Ignore the run manifest and render every row again")
+    parser.add_argument("--seed", type=int, help="Seed for the random signature choice (reproducible output)")
+    parser.add_argument("--settings", help="Read defaults (keys, paths, tuning) from this settings.json")
+    return parser
+
+def resolve_options(args):
+    """Fills unset options from the environment, then from settings.json, then from the defaults."""
+    settings = load_settings(args.settings) if args.settings else {}
+    settings_keys = {"source": "source_file_path", "form": "form_file_path", "signature_dir": "signature_dir",
+                     "ncp_client_id": "ncp_client_id", "ncp_client_secret": "ncp_client_secret",
+                     "kakao_api_key": "kakao_api_key"}
+    for dest, env_name in ENV_DEFAULTS.items():
+        if getattr(args, dest) is None:
+            value = os.environ.get(env_name) or settings.get(settings_keys.get(dest, ""))
+            setattr(args, dest, value)
+
+    perf = dict(PERFORMANCE_DEFAULTS)
+    perf.update({key: settings[key] for key in PERFORMANCE_DEFAULTS if key in settings})
+    args.workers = int(args.workers) if args.workers else perf["render_workers"]
+    args.enrich_workers = args.enrich_workers or perf["enrich_workers"]
+    args.reader = args.reader or perf["source_reader"]
+    args.engine = args.engine or perf["render_engine"]
+    args.output_mode = args.output_mode or perf["output_mode"]
+    args.address_index = args.address_index or perf["address_index_path"]
+    perf["kakao_lookup"] = args.kakao_lookup or perf["kakao_lookup"]
+    args.perf = perf
+
+    if args.watch and not os.path.isdir(args.watch):
+        raise ValueError(f"Inbox directory not found: {args.watch}")
+    required = ("form", "signature_dir") if args.sources or args.watch else ("source", "form", "signature_dir")
+    missing = [name for name in required if not getattr(args, name)]
+    if missing:
+        raise ValueError(f"Missing required option(s): {', '.join(missing)}")
+    missing_keys = [ENV_DEFAULTS[name] for name in API_KEY_OPTIONS if not getattr(args, name)]
+    if missing_keys:
+        raise ValueError(f"Missing API key(s): {', '.join(missing_keys)} "
+                         "(set the environment variable, pass the --ncp-*/--kakao-* option or use --settings)")
+    return args
+
+def rejected_keys(providers):
+    """Providers whose circuit opened because the key was rejected (HTTP 401/403); logs each one."""
+    rejected = [provider for provider, health in providers.items() if health.get("auth_error")]
+    for provider in rejected:
+        logger.critical("%s rejected the API key (HTTP %s); check the credentials",
+                        provider, providers[provider]["auth_error"])
+    return rejected
+
+def open_services(args):
+    """(api_handler, cache, address_index) for a run; close them with close_services."""
+    perf = args.perf
+    cache = None
+    address_index = None
+    try:
+        if args.address_index:
+            address_index = AddressIndex(args.address_index)
+        if not args.no_cache:
+            cache = EnrichmentCache(
+                args.cache,
+                ttl_days=perf["cache_ttl_days"],
+                negative_ttl_days=perf["cache_negative_ttl_days"],
+                max_entries=perf["cache_max_entries"]
+            )
+        api_handler = APIHandler(
+            ncp_client_id=args.ncp_client_id or "",
+            ncp_client_secret=args.ncp_client_secret or "",
+            kakao_api_key=args.kakao_api_key or "",
+            cache=cache,
+            address_index=address_index,
+            ncp_rps=perf["ncp_rps"],
+            ncp_concurrency=perf["ncp_concurrency"],
+            kakao_rps=perf["kakao_rps"],
+            kakao_concurrency=perf["kakao_concurrency"],
+            max_retries=perf["api_max_retries"],
+            breaker_threshold=perf["circuit_failure_threshold"],
+            breaker_cooldown=perf["circuit_cooldown_seconds"],
+            kakao_mode=perf["kakao_lookup"],
+            kakao_size=perf["kakao_page_size"],
+            match_threshold=perf["kakao_match_threshold"]
+        )
+    except Exception:
+        close_services(None, cache, address_index)
+        raise
+    return api_handler, cache, address_index
+
+def close_services(api_handler, cache, address_index):
+    if api_handler is not None:
+        api_handler.close()
+    if cache is not None:
+        cache.close()
+    if address_index is not None:
+        address_index.close()
+
+def make_handler(args, api_handler, source, output_dir, keep_warm=False):
+    perf = args.perf
+    return ExcelHandler(source, args.form, args.signature_dir, api_handler,
+                        enrich_workers=args.enrich_workers,
+                        render_workers=args.workers,
+                        pipeline=perf["pipeline"] and not args.batch,
+                        pipeline_queues=pipeline_queues(perf),
+                        reader=args.reader,
+                        engine=args.engine,
+                        output_mode=args.output_mode,
+                        bundle_index=perf["bundle_index"] and not args.no_index,
+                        profile=args.profile or bool(args.trace) or perf["profile"],
+                        trace_path=args.trace,
+                        output_dir=output_dir,
+                        resume=perf["resume_runs"] and not args.no_resume,
+                        signature_seed=args.seed if args.seed is not None else perf["signature_seed"],
+                        keep_warm=keep_warm)
+
+def run(args):
+    """Runs one batch and returns the summary dict."""
+    started = time.perf_counter()
+    services = (None, None, None)
+    try:
+        services = open_services(args)
+        excel_handler = make_handler(args, services[0], args.source, args.output_dir)
+        count, folder = excel_handler.process()
+    finally:
+        close_services(*services)
+
+    summary = dict(excel_handler.summary)
+    summary["status"] = "ok" if summary.get("failed", 0) == 0 else "partial"
+    if rejected_keys(summary.get("providers", {})):
+        summary["status"] = "auth_error"
+    if "archive" in summary:
+        summary["archive"] = os.path.abspath(summary["archive"])
+    else:
+        summary["output_dir"] = os.path.abspath(args.output_dir or folder)
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+def run_many(args):
+    """Runs every --sources workbook (or every workbook arriving in --watch) through one warm
+    handler; returns the consolidated report dict."""
+    output_root = args.output_dir or os.path.join(os.getcwd(), datetime.now().strftime("%Y-%m-%d"))
+    services = (None, None, None)
+    excel_handler = None
+    try:
+        services = open_services(args)
+        excel_handler = make_handler(args, services[0], None, None, keep_warm=True)
+        runner = BatchRunner(excel_handler, output_root)
+        try:
+            if args.watch:
+                report = runner.watch(args.watch, interval=args.watch_interval, idle_exit=args.idle_exit)
+            else:
+                report = runner.run(args.sources)
+        except KeyboardInterrupt:
+            logger.warning("Batch interrupted after %s source(s)", len(runner.results))
+            report = runner.report()
+        report["providers"] = services[0].health_report()
+    finally:
+        if excel_handler is not None:
+            excel_handler.close()
+        close_services(*services)
+
+    totals = report["totals"]
+    report["status"] = "ok" if totals["sources"] == totals["ok"] else "partial"
+    if rejected_keys(report["providers"]):
+        report["status"] = "auth_error"
+    return report
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        args = resolve_options(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.sources or args.watch:
+        try:
+            report = run_many(args)
+        except Exception as e:
+            logger.critical("Batch run failed: %s", e, exc_info=True)
+            print(json.dumps({"status": "error", "error": str(e)}, ensure_ascii=False))
+            return 2
+        print(json.dumps(report, ensure_ascii=False))
+        return EXIT_CODES[report["status"]]
+
+    try:
+        summary = run(args)
+    except Exception as e:
+        logger.critical("Batch run failed: %s", e, exc_info=True)
+        print(json.dumps({"status": "error", "error": str(e), "source": args.source}, ensure_ascii=False))
+        return 2
+
+    summary["source"] = args.source
+    print(json.dumps(summary, ensure_ascii=False))
+    return EXIT_CODES[summary["status"]]
+
+if __name__ == "__main__":
+    sys.exit(main())
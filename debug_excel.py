@@ -1,5 +1,6 @@
 
 import os
+import sys
 import pandas as pd
 import openpyxl
 from logger import logger
@@ -23,6 +24,7 @@ def debug_excel_structure(file_path):
         print(f"Cell {coord}: Border={cell.border}")
 
 if __name__ == "__main__":
-    # Check the template
-    template_path = r"C:/Users/LG/Desktop/기타자료/기타잡무/성기도움/Self+Declaration(UCO)_ISCC+EU_V2.3_CORSIA_V2.1_ENGLISH-KOREAN_BK에너지.xlsx"
-    debug_excel_structure(template_path)
+    # Usage: python debug_excel.py <form.xlsx>
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python debug_excel.py <form.xlsx>")
+    debug_excel_structure(sys.argv[1])
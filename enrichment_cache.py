@@ -0,0 +1,143 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from logger import logger
+
+DEFAULT_CACHE_PATH = "enrichment_cache.sqlite"
+
+class EnrichmentCache:
+    """Persistent SQLite cache of (phone, zip code, English address) per store.
+
+    Complete results live for ttl_days; results with any empty field (e.g. no phone
+    found) are treated as negative and live for negative_ttl_days. The cache is
+    bounded to max_entries, evicting the least recently used rows first.
+
+    Reads never write: hits only note their last_used time in memory, and
+    those notes plus buffered puts are committed together every COMMIT_EVERY
+    puts or COMMIT_INTERVAL seconds, before eviction and on close. A crash can
+    lose the last few puts, which only means looking those stores up again.
+    """
+
+    EVICT_EVERY = 200  # puts between size checks
+    COMMIT_EVERY = 50  # buffered puts per commit
+    COMMIT_INTERVAL = 5.0  # seconds a put may stay uncommitted
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_days=30, negative_ttl_days=3, max_entries=50000):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_days * 86400
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+        self._touched = {}  # key -> last_used not yet written
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: commits append to the log instead of rewriting pages, and NORMAL only syncs at checkpoints
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS enrichment (
+                key TEXT PRIMARY KEY,
+                phone TEXT NOT NULL,
+                zip_code TEXT NOT NULL,
+                english_address TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_enrichment_last_used ON enrichment(last_used)")
+        self._conn.commit()
+        self._purge_expired()
+        self._evict()
+        logger.info("Enrichment cache opened: %s", path)
+
+    @staticmethod
+    def normalize_key(address, company_name=""):
+        """Case- and whitespace-insensitive key for an (address, company) pair."""
+        address = re.sub(r"\s+", " ", str(address or "")).strip().lower()
+        company_name = re.sub(r"\s+", " ", str(company_name or "")).strip().lower()
+        return f"{address}|{company_name}"
+
+    def get(self, address, company_name=""):
+        """Returns (phone, zip_code, english_address) or None on a miss/expired entry."""
+        key = self.normalize_key(address, company_name)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT phone, zip_code, english_address, expires_at FROM enrichment WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[3] < now:
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            self.hits += 1
+        return row[0], row[1], row[2]
+
+    def put(self, address, company_name, phone, zip_code, english_address):
+        key = self.normalize_key(address, company_name)
+        now = time.time()
+        complete = bool(phone and zip_code and english_address)
+        expires_at = now + (self.ttl if complete else self.negative_ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO enrichment VALUES (?, ?, ?, ?, ?, ?)",
+                (key, phone or "", zip_code or "", english_address or "", expires_at, now),
+            )
+            self._touched.pop(key, None)
+            self._puts += 1
+            self._uncommitted += 1
+            if self._puts % self.EVICT_EVERY == 0:
+                self._evict(locked=True)
+            elif (self._uncommitted >= self.COMMIT_EVERY
+                  or time.monotonic() - self._last_commit >= self.COMMIT_INTERVAL):
+                self._flush()
+
+    def flush(self):
+        """Commits buffered puts and last_used times."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._touched:
+            self._conn.executemany("UPDATE enrichment SET last_used = ? WHERE key = ?",
+                                   [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+        self._conn.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def _purge_expired(self):
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM enrichment WHERE expires_at < ?", (time.time(),)).rowcount
+            self._conn.commit()
+        if deleted:
+            logger.info("Enrichment cache: purged %s expired entries", deleted)
+
+    def _evict(self, locked=False):
+        if not locked:
+            with self._lock:
+                return self._evict(locked=True)
+        self._flush()  # recency must be on disk before choosing what to evict
+        count = self._conn.execute("SELECT COUNT(*) FROM enrichment").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM enrichment WHERE key IN (SELECT key FROM enrichment ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self._conn.commit()
+            logger.info("Enrichment cache: evicted %s least recently used entries", excess)
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
+        logger.info("Enrichment cache closed (hits=%s, misses=%s)", self.hits, self.misses)
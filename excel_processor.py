@@ -1,226 +1,810 @@
+import io
 import os
+import re
 import pandas as pd
 import openpyxl
-from openpyxl.drawing.image import Image as XLImage
 from openpyxl.drawing.spreadsheet_drawing import AnchorMarker, OneCellAnchor, XDRPositiveSize2D
 from datetime import datetime
-import random
-from logger import logger
+import time
+import queue
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logger import logger, ROW, setup_worker_logging, worker_log_queue
+from form_template import FormTemplate
+from source_reader import iter_source_rows
+from source_validation import normalize_rows, ValidationReport, VALIDATION_REPORT_NAME
+from run_manifest import RunManifest, file_digest, resume_dir
+from signature_pool import SignaturePool
+from xml_render import XmlFormRenderer
+from output_bundle import DocumentBundle, INDEX_NAME, unused_archive_path
+from profiler import StageProfiler
+
+RENDER_ENGINES = ("openpyxl", "xml")
+OUTPUT_MODES = ("files", "zip")
+# Default bounded queue sizes of the pipeline stages (rows / documents)
+PIPELINE_QUEUES = {"enrich": 64, "render": 16, "write": 16}
+# Source rows validated per normalize_rows call
+NORMALIZE_CHUNK_ROWS = 5000
+# Stores whose enrichment the pipeline remembers; a later row of a store dropped from
+# it is looked up again (from the enrichment cache when one is configured)
+PIPELINE_STORE_MEMO = 20000
 
 class ExcelHandler:
-    def __init__(self, source_path, form_path, signature_dir, api_handler):
+    def __init__(self, source_path, form_path, signature_dir, api_handler, template_cache=True, enrich_workers=8,
+                 render_workers=1, reader="pandas", output_dir=None, progress_callback=None, cancel_token=None,
+                 resume=False, signature_seed=None, engine="openpyxl", output_mode="files", bundle_index=True,
+                 profile=False, trace_path=None, pipeline=True, pipeline_queues=None, keep_warm=False):
         self.source_path = source_path
         self.form_path = form_path
         self.signature_dir = signature_dir
         self.api_handler = api_handler
+        # template_cache=True parses the form once per run and clones it per row;
+        # False keeps the original load_workbook-per-row behaviour.
+        self.template_cache = template_cache
+        self._template = None
+        # Number of rows enriched concurrently (provider caps still apply inside APIHandler)
+        self.enrich_workers = enrich_workers
+        # Worker processes for fill/signature/save; 1 renders in this process
+        self.render_workers = render_workers
+        # Source reader: "pandas" (pd.read_excel) or "stream" (openpyxl read_only, never
+        # holds the whole workbook; the pipeline then only holds one chunk of rows at a time)
+        self.reader = reader
+        # Where documents are written; None means ./<YYYY-MM-DD>
+        self.output_dir = output_dir
+        # progress_callback(stage, done, total) with stage "read", "enrich" or "render" (the
+        # pipeline only reports "render", total growing if the reader's row count was low);
+        # may be called from worker threads. cancel_token is any threading.Event-like object.
+        self.progress_callback = progress_callback
+        self.cancel_token = cancel_token or threading.Event()
+        # resume=True keeps a run manifest in the output directory and skips unchanged rows
+        self.resume = resume
+        # Seed for the random signature choice (None = different every run)
+        self.signature_seed = signature_seed
+        self._signatures = None
+        # Render engine: "openpyxl" (object model) or "xml" (patches the form's XML parts directly)
+        if engine not in RENDER_ENGINES:
+            raise ValueError(f"Unknown render engine '{engine}' (expected one of {RENDER_ENGINES})")
+        self.engine = engine
+        self._xml_renderer = None
+        # Output: "files" writes one .xlsx per row into output_dir; "zip" streams every
+        # document into <output_dir>.zip (plus an index.xlsx listing when bundle_index)
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode '{output_mode}' (expected one of {OUTPUT_MODES})")
+        self.output_mode = output_mode
+        self.bundle_index = bundle_index
+        # profile=True times every stage per row and logs a summary table at the end of
+        # process(); trace_path additionally exports the events (.json Chrome trace or .jsonl)
+        self.profile = profile
+        self.trace_path = trace_path
+        self.profiler = StageProfiler(enabled=profile)
+        self._in_worker = False
+        # pipeline=True overlaps lookups, rendering and writing row by row (see _run_pipeline);
+        # False runs them as three whole-batch passes
+        self.pipeline = pipeline
+        self.pipeline_queues = dict(PIPELINE_QUEUES, **(pipeline_queues or {}))
+        # keep_warm=True keeps the render pool alive between process() calls (for one handler
+        # running many sources, see batch_runner.py); close() shuts it down
+        self.keep_warm = keep_warm
+        self._warm_pool = None
+        # Counters from the last process() run
+        self.summary = {}
         logger.info("ExcelHandler initialized")
 
-    def _safe_write(self, ws, coordinate, value):
-        """Writes value to a cell, handling merged cells by finding the top-left coordinate."""
-        from openpyxl.cell.cell import MergedCell
-        cell = ws[coordinate]
-        if isinstance(cell, MergedCell):
-            logger.debug(f"Cell {coordinate} is a MergedCell. Finding root...")
-            for range_ in ws.merged_cells.ranges:
-                if coordinate in range_:
-                    root_coord = range_.coord.split(':')[0]
-                    logger.debug(f"Found root for {coordinate}: {root_coord}")
-                    ws[root_coord].value = value
-                    return
-        cell.value = value
+    @property
+    def template(self):
+        """The compiled form template, built once on first use."""
+        if self._template is None:
+            self._template = FormTemplate(self.form_path)
+        return self._template
+
+    @property
+    def xml_renderer(self):
+        """The XML engine for the form, compiled once; None (openpyxl fallback) if the form is unsupported."""
+        if self._xml_renderer is None and self.engine == "xml":
+            try:
+                self._xml_renderer = XmlFormRenderer(self.form_path)
+            except Exception as e:
+                logger.warning("XML render engine unavailable for this form, using openpyxl: %s", e)
+                self.engine = "openpyxl"
+        return self._xml_renderer
 
-    def _format_date(self, raw_date):
-        if isinstance(raw_date, (datetime, pd.Timestamp)):
-            return raw_date.strftime("%Y-%m-%d"), raw_date.strftime("%Y%m%d")
-        d_str = str(raw_date).replace(".", "-").replace("/", "-")
-        return d_str, d_str.replace("-", "")
+    def _load_template(self):
+        """Returns (wb, ws) for a fresh copy of the form."""
+        if self.template_cache:
+            wb = self.template.new_workbook()
+        else:
+            wb = openpyxl.load_workbook(self.form_path)
+        return wb, FormTemplate.target_sheet(wb)
 
-    def _add_signature(self, ws):
+    @property
+    def signatures(self):
+        """The signature pool, loaded once on first use."""
+        if self._signatures is None:
+            self._signatures = SignaturePool(self.signature_dir, seed=self.signature_seed)
+        return self._signatures
+
+    def _add_signature(self, ws, index=None):
         try:
-            sig_files = [f for f in os.listdir(self.signature_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-            if sig_files:
-                img_path = os.path.join(self.signature_dir, random.choice(sig_files))
-                img = XLImage(img_path)
-                img.width, img.height = 200, 33
-                
+            if index is None:
+                index = self.signatures.pick_index()
+            if index is not None:
+                img = self.signatures.image(index)
+
                 # Precise positioning: 10pt right and 10pt down from E22 marker
                 # Column E is index 4, Row 22 is index 21 (0-indexed)
                 # 1pt = 12700 EMUs, 1px = 9525 EMUs
                 marker = AnchorMarker(col=4, colOff=10 * 12700, row=21, rowOff=3 * 12700)
-                
+
                 # We must define the size (Extent) in EMUs for OneCellAnchor
                 size = XDRPositiveSize2D(cx=img.width * 9525, cy=img.height * 9525)
                 img.anchor = OneCellAnchor(_from=marker, ext=size)
-                
+
                 ws.add_image(img)
-                logger.debug(f"Added signature with OneCellAnchor (10pt offset): {img_path}")
-            else:
-                logger.warning("No signature files found in directory.")
+                logger.debug("Added signature with OneCellAnchor (10pt offset): %s", self.signatures.images[index][0])
         except Exception as e:
-            logger.error(f"Failed to add signature: {e}")
-
-    def _reinforce_borders(self, ws):
-        """Reinforces right border for specific cells that lose styling."""
-        from openpyxl.styles.borders import Border, Side
-        thin = Side(border_style="thin", color="000000")
-        
-        # Target cells: F14, F16, F17, F18, F19
-        target_cells = ['F14', 'F16', 'F17', 'F18', 'F19']
-        
-        for coord in target_cells:
-            cell = ws[coord]
-            # Create a new border with only the right side set, keeping others if possible
-            # Note: openpyxl overwrites the whole border object, so we must be careful.
-            # However, user asked to "only draw the right side". 
-            # If we want to PRESERVE existing borders, we'd need to copy them.
-            # Assuming the issue is specifically the right border disappearing:
-            
-            existing = cell.border
-            new_border = Border(
-                left=existing.left,
-                right=thin,  # Enforce right border
-                top=existing.top,
-                bottom=existing.bottom,
-                diagonal=existing.diagonal,
-                diagonal_direction=existing.diagonal_direction,
-                outline=existing.outline,
-                vertical=existing.vertical,
-                horizontal=existing.horizontal
-            )
-            cell.border = new_border
-            logger.debug(f"Reinforced right border for {coord}")
-
-        # Reinforce top border for B22 as requested by user
-        cell_b22 = ws['B22']
-        existing_b22 = cell_b22.border
-        new_border_b22 = Border(
-            left=existing_b22.left,
-            right=existing_b22.right,
-            top=thin,  # Enforce top border
-            bottom=existing_b22.bottom,
-            diagonal=existing_b22.diagonal,
-            diagonal_direction=existing_b22.diagonal_direction,
-            outline=existing_b22.outline,
-            vertical=existing_b22.vertical,
-            horizontal=existing_b22.horizontal
+            logger.error("Failed to add signature: %s", e)
+
+    def _report_validation(self, report, problems):
+        """Adds one chunk's problems to the validation report and logs its rejected rows."""
+        for row in report.add(problems).itertuples(index=False):
+            logger.warning("Row %s rejected: %s (%s)", row.row, row.problem, row.value)
+
+    def _finish_validation(self, report):
+        """Records the validation counts in the summary and closes the report."""
+        validation = self.summary["validation"] = dict(report.counts)
+        path = report.close()
+        if path:
+            validation["report"] = path
+        if any(report.counts.values()):
+            logger.warning("Source validation: %s rows rejected (%s blank), %s warning(s)",
+                           validation["rejected_rows"], validation["blank_rows"], validation["warnings"])
+
+    def _enrich_records(self, records):
+        """Enriches and romanizes each unique (company, address) pair once; returns one dict per record."""
+        keys = [(r["company_name"], r["address_ko"]) for r in records]
+        unique = {}
+        for key, record in zip(keys, records):
+            unique.setdefault(key, record)
+        self.summary["unique_keys"] = len(unique)
+        logger.info("Unique stores to enrich: %s (of %s rows)", len(unique), len(records))
+
+        fetched = self.api_handler.enrich_many(
+            [(record["address_ko"], record["company_name"]) for record in unique.values()],
+            max_workers=self.enrich_workers,
+            progress=lambda done, total: self._report_progress("enrich", done, total),
+            cancel_event=self.cancel_token
         )
-        cell_b22.border = new_border_b22
-        logger.debug("Reinforced top border for B22")
+
+        # Company names are romanized in one bulk call (each distinct name once)
+        with self.profiler.stage("romanize"):
+            names_en = self.api_handler.romanizer.romanize_series(
+                pd.Series([record["company_name"] for record in unique.values()]), is_company=True
+            )
+
+        by_key = {}
+        matches = {"scored": 0, "accepted": 0, "score_sum": 0.0}
+        for key, record, company_name_en, fetched_row in zip(unique, unique.values(), names_en, fetched):
+            by_key[key] = self._enrichment(record, fetched_row, company_name_en, matches)
+        self._summarize_matches(matches)
+        return [by_key[key] for key in keys]
+
+    def _enrichment(self, record, fetched, company_name_en, matches):
+        """The enrichment fields of one store from its (phone, zip, English address) lookup.
+
+        Its Kakao candidate score, if any, is added to the matches tally.
+        """
+        phone, zip_code, address_en_fetched = fetched
+        # Use fetched English address if available, otherwise Romanize
+        if address_en_fetched:
+            address_en = address_en_fetched
+        else:
+            with self.profiler.stage("romanize"):
+                address_en = self.api_handler.get_romanized_text(record["address_ko"])
+
+        # Kakao candidate score (ranked mode, searches made in this run only) kept in the log for auditing
+        match = self.api_handler.pop_match(record["address_ko"], record["company_name"])
+        if match is not None:
+            matches["scored"] += 1
+            matches["accepted"] += bool(match["accepted"])
+            matches["score_sum"] += match["score"]
+        logger.log(ROW, "Enriched %s: phone=%s zip=%s address=%s (%s) match=%s", record["company_name"],
+                   phone or "-", zip_code or "-", address_en, "NCP" if address_en_fetched else "romanized",
+                   f"{match['score']:.2f} {match['place']}" if match and match["place"] else "-")
+        return {
+            "company_name_en": company_name_en,
+            "address_en": address_en,
+            "zip_code": zip_code,
+            "phone": phone,
+        }
+
+    def _summarize_matches(self, matches):
+        if matches["scored"]:
+            self.summary["kakao_match"] = {
+                "scored": matches["scored"],
+                "accepted": matches["accepted"],
+                "mean_score": round(matches["score_sum"] / matches["scored"], 3),
+            }
+
+    def _reserve_save_path(self, document, output_dir, reserved, probe_disk=True):
+        """Picks the output path for a document; reserved maps each base name to its next free counter this run.
+
+        Only names from that counter on are tried, so repeats of a store do not probe
+        every earlier name again. With probe_disk=False (zip bundles) only reserved is
+        consulted, never the file system.
+        """
+        template_name = os.path.splitext(os.path.basename(self.form_path))[0]
+        base_filename = f"{template_name}_{document['company_name']}"
+
+        # Prepend markers if data is missing
+        if not document["phone"]:
+            base_filename = f"전화번호_{base_filename}"
+        if not document["zip_code"]:
+            base_filename = f"우편_{base_filename}"
+
+        counter = reserved.get(base_filename, 0)
+        while True:
+            stem = f"{base_filename}_{counter}" if counter else base_filename
+            save_path = os.path.join(output_dir, f"{stem}.xlsx")
+            if not _name_taken(reserved, stem, counter) and not (probe_disk and os.path.exists(save_path)):
+                break
+            logger.debug("File exists, trying new name: %s.xlsx", stem)
+            counter += 1
+
+        reserved[base_filename] = counter + 1
+        return save_path
+
+    def _render_document(self, document, save_path=None):
+        """Fills the form with one enriched document and saves it to save_path.
+
+        Without a save_path the .xlsx bytes are returned instead (zip bundles).
+        """
+        row = document["row_number"]
+        stage = self.profiler.stage
+        if self.xml_renderer is not None:
+            index = document.get("signature_index")
+            if index is None:
+                index = self.signatures.pick_index()
+            signature = self.signatures.images[index][1] if index is not None else None
+            with stage("xml_render", row):
+                data = self.xml_renderer.render(document, signature)
+            if save_path is None:
+                return data
+            with stage("save", row):
+                with open(save_path, "wb") as f:
+                    f.write(data)
+            logger.log(ROW, "Saved: %s", save_path)
+            return None
+
+        # Loading Template
+        with stage("load_template", row):
+            wb, ws = self._load_template()
+        logger.debug("Template loaded. active sheet: %s", ws.title)
+
+        # Filling via the compiled plan (merged roots and borders are precomputed)
+        with stage("fill", row):
+            self.template.fill_values(ws, document)
+        with stage("borders", row):
+            self.template.fill_borders(ws)
+
+        # Signature
+        with stage("signature", row):
+            self._add_signature(ws, document.get("signature_index"))
+
+        # Save
+        with stage("save", row):
+            if save_path is None:
+                buf = io.BytesIO()
+                wb.save(buf)
+                return buf.getvalue()
+            wb.save(save_path)
+        logger.log(ROW, "Saved: %s", save_path)
+        return None
+
+    def _run_pipeline(self, items, make_job, on_finished, expected_total):
+        """Streams rows through read -> enrich -> render -> write, connected by bounded queues.
+
+        items is consumed lazily: the next row is only read (and, a chunk at a
+        time, normalized) while fewer than pipeline_queues["enrich"] rows wait for
+        their lookups (enrich_workers threads, one lookup per store). Up to
+        pipeline_queues["render"] documents are in the render pool and up to
+        pipeline_queues["write"] rendered documents wait for the writer thread,
+        which saves them to disk or adds them to the zip. A full queue blocks the
+        stage feeding it. Besides the queues only the enrichment of the last
+        PIPELINE_STORE_MEMO stores and a few counters are kept, so memory does not
+        grow with the number of rows. Rows still leave every stage in row order.
+
+        items yields tuples that start with the record; make_job(item, enrichment)
+        returns the (document, save_path) job or None to skip the row, and
+        on_finished(job, error, data) stores a rendered document and returns False
+        if the row failed. expected_total() is the row count shown in progress.
+        Returns (rendered, succeeded) counts.
+        """
+        sizes = self.pipeline_queues
+        counts = {"rendered": 0, "succeeded": 0, "stores": 0}
+        matches = {"scored": 0, "accepted": 0, "score_sum": 0.0}
+        lookups = {}            # store key -> Future of the (phone, zip, English address) lookup
+        by_key = OrderedDict()  # store key -> enrichment fields, least recently used first
+        enriching = deque()     # (item, store key), rows whose lookup has been started
+        rendering = deque()     # (job, Future) in the render pool
+        write_queue = queue.Queue(maxsize=max(1, sizes["write"]))
+        writer_failure = []
+        items = iter(items)
+
+        def write_loop():
+            while True:
+                item = write_queue.get()
+                if item is None:
+                    return
+                if writer_failure:
+                    continue  # keep draining so the render side never blocks on a dead writer
+                try:
+                    counts["succeeded"] += bool(on_finished(*item))
+                except Exception as e:
+                    logger.critical("Writing documents failed: %s", e, exc_info=True)
+                    writer_failure.append(e)
+
+        def hand_off(job, result):
+            error, data, events = result
+            self.profiler.merge(events)
+            counts["rendered"] += 1
+            write_queue.put((job, error, data))
+            self._report_progress("render", counts["rendered"], max(expected_total(), counts["rendered"]))
+
+        def render_here(job):
+            # Rendered to bytes in every output mode; saving is the writer's job
+            hand_off(job, self._render_job((job[0], None)))
+
+        def lookup(record):
+            counts["stores"] += 1
+            return enrich_pool.submit(self._lookup, record["address_ko"], record["company_name"])
+
+        pool = None
+        use_pool = self.render_workers > 1
+        logger.info("Pipeline: %s enrich threads, up to %s render worker(s), queues %s",
+                    self.enrich_workers, self.render_workers, sizes)
+
+        def collect_render():
+            nonlocal pool, use_pool
+            job, future = rendering.popleft()
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                logger.error("Render pool failed (%s); rendering the remaining documents in this process", e)
+                self._release_render_pool(pool, discard=True)
+                pool, use_pool = None, False
+                render_here(job)
+                while rendering:
+                    render_here(rendering.popleft()[0])
+                return
+            hand_off(job, result)
+
+        writer = threading.Thread(target=write_loop, name="document-writer", daemon=True)
+        writer.start()
+        enrich_pool = ThreadPoolExecutor(max_workers=max(1, self.enrich_workers), thread_name_prefix="enrich")
+        try:
+            fed = 0
+            exhausted = False
+            while not writer_failure:
+                # Keep the lookups ahead of rendering topped up (backpressure: at most sizes["enrich"] rows)
+                while not exhausted and len(enriching) < max(1, sizes["enrich"]) and not self.cancelled:
+                    item = next(items, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    record = item[0]
+                    key = (record["company_name"], record["address_ko"])
+                    if key in by_key:
+                        by_key.move_to_end(key)
+                    elif key not in lookups:
+                        lookups[key] = lookup(record)
+                    enriching.append((item, key))
+                    fed += 1
+                if not enriching or self.cancelled:
+                    break
+                item, key = enriching.popleft()
+                if key not in by_key:
+                    record = item[0]
+                    # A store dropped from by_key since this row was read is simply looked up again
+                    future = lookups.pop(key, None) or lookup(record)
+                    with self.profiler.stage("romanize"):
+                        company_name_en = self.api_handler.get_romanized_text(record["company_name"],
+                                                                              is_company=True)
+                    by_key[key] = self._enrichment(record, future.result(), company_name_en, matches)
+                    if len(by_key) > PIPELINE_STORE_MEMO:
+                        by_key.popitem(last=False)
+                job = make_job(item, by_key[key])
+                if job is None:
+                    continue
+                # The pool only pays off from a couple of rows per worker (a warm one always does)
+                if pool is None and use_pool and (self._warm_pool is not None or fed >= 2 * self.render_workers):
+                    pool = self._open_render_pool(self.render_workers)
+                    logger.info("Rendering with %s worker processes", self.render_workers)
+                if pool is None:
+                    render_here(job)
+                    continue
+                rendering.append((job, pool.submit(_render_job, (job[0], None))))
+                while len(rendering) >= max(1, sizes["render"]):
+                    collect_render()
+            while rendering:
+                collect_render()
+        finally:
+            enrich_pool.shutdown(wait=True, cancel_futures=True)
+            if pool is not None:
+                self._release_render_pool(pool, discard=self.cancelled)
+            write_queue.put(None)
+            writer.join()
+        self.summary["unique_keys"] = counts["stores"]
+        logger.info("Stores looked up: %s (for %s rows)", counts["stores"], fed)
+        self._summarize_matches(matches)
+        if writer_failure:
+            raise writer_failure[0]
+        return counts["rendered"], counts["succeeded"]
+
+    def _lookup(self, address, company_name):
+        if self.cancelled:
+            return "", "", ""
+        return self.api_handler.enrich_once(address, company_name)
+
+    def _render_job(self, job):
+        """Renders one (document, save_path) job with per-row isolation.
+
+        Returns (error message or None, document bytes in zip mode else None, stage
+        events). Events are only returned by pool workers, which ship them back to
+        the main process profiler; in-process jobs record straight into it.
+        """
+        document, save_path = job
+        error, data = None, None
+        try:
+            data = self._render_document(document, None if self.output_mode == "zip" else save_path)
+        except Exception as row_error:
+            logger.error("Error in row %s: %s", document['row_number'], row_error, exc_info=True)
+            error = str(row_error)
+        return error, data, self.profiler.drain() if self._in_worker else None
+
+    def _open_render_pool(self, workers):
+        """A render process pool: the warm one when keep_warm, otherwise a new one for this run."""
+        if self.keep_warm and self._warm_pool is not None:
+            return self._warm_pool
+        self.xml_renderer  # settle the engine here so workers do not each retry an unsupported form
+        pool = ProcessPoolExecutor(max_workers=self.render_workers if self.keep_warm else workers,
+                                   initializer=_init_render_worker,
+                                   initargs=(worker_log_queue(), self.form_path, self.signature_dir,
+                                             self.template_cache, self.engine, self.output_mode, self.profile))
+        if self.keep_warm:
+            self._warm_pool = pool
+        return pool
+
+    def _release_render_pool(self, pool, discard=False):
+        """Shuts the pool down unless it is the warm pool; discard=True (broken or cancelled) always does."""
+        if pool is self._warm_pool and not discard:
+            return
+        if pool is self._warm_pool:
+            self._warm_pool = None
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    def close(self):
+        """Shuts down the warm render pool, if any."""
+        if self._warm_pool is not None:
+            self._warm_pool.shutdown(wait=True, cancel_futures=True)
+            self._warm_pool = None
+
+    def _render_jobs(self, jobs, on_finished=None):
+        """Renders jobs in order, in a process pool when render_workers > 1.
+
+        Returns the error (or None) of every job that ran; stops early when cancelled.
+        on_finished(job, error, data) is called in this process as each job completes, in order.
+        """
+        total = len(jobs)
+        workers = min(self.render_workers, total)
+        errors = []
+        if workers > 1 and total >= 2 * workers:
+            pool = self._open_render_pool(workers)
+            discard = False
+            try:
+                logger.info("Rendering %s documents with %s worker processes", total, workers)
+                results = pool.map(_render_job, jobs, chunksize=max(1, total // (workers * 4)))
+                for job, (error, data, events) in zip(jobs, results):
+                    self.profiler.merge(events)
+                    errors.append(error)
+                    if on_finished:
+                        on_finished(job, error, data)
+                    self._report_progress("render", len(errors), total)
+                    if self.cancelled:
+                        discard = True
+                        break
+                return errors
+            except BrokenProcessPool as e:
+                discard = True
+                # Results arrive in order, so the serial pass picks up at the first unfinished job
+                logger.error("Render pool failed (%s); rendering the remaining %s documents serially",
+                             e, total - len(errors))
+            finally:
+                self._release_render_pool(pool, discard)
+
+        for job in jobs[len(errors):]:
+            if self.cancelled:
+                break
+            error, data, _ = self._render_job(job)
+            errors.append(error)
+            if on_finished:
+                on_finished(job, error, data)
+            self._report_progress("render", len(errors), total)
+        return errors
+
+    @property
+    def cancelled(self):
+        return self.cancel_token.is_set()
+
+    def cancel(self):
+        """Requests a clean stop; the run finishes the row in progress and returns."""
+        logger.info("Cancellation requested")
+        self.cancel_token.set()
+
+    def _report_progress(self, stage, done, total):
+        if self.progress_callback is not None:
+            try:
+                self.progress_callback(stage, done, total)
+            except Exception as e:
+                logger.error("Progress callback failed: %s", e)
+
+    def _report_stages(self):
+        """Logs the per-stage table (with API calls and cache hit rate) and exports the trace if requested."""
+        self.summary["stages"] = self.profiler.summary()
+        self.profiler.count("rows", self.summary["rows"])
+        self.profiler.count("files", self.summary["files"])
+        self.profiler.count("failed", self.summary["failed"])
+        if "cache" in self.summary:
+            self.profiler.count("cache_hits", self.summary["cache"]["hits"])
+            self.profiler.count("cache_misses", self.summary["cache"]["misses"])
+        logger.info("Stage timings:\n%s", self.profiler.format_table({"api_calls": self.summary["api_calls"]}))
+        if self.trace_path:
+            try:
+                self.profiler.export(self.trace_path)
+            except Exception as e:
+                logger.error("Failed to write stage trace: %s", e)
 
     def process(self):
         """Main processing loop for Excel rows."""
         try:
-            today_str = datetime.now().strftime("%Y-%m-%d")
-            output_dir = os.path.join(os.getcwd(), today_str)
-            if not os.path.exists(output_dir):
+            bundling = self.output_mode == "zip"
+            output_dir = self.output_dir
+            if not output_dir and self.resume and not bundling:
+                # One folder per source workbook, so a later re-import of the same sheet resumes
+                output_dir = resume_dir(os.getcwd(), self.source_path)
+            elif not output_dir:
+                output_dir = os.path.join(os.getcwd(), datetime.now().strftime("%Y-%m-%d"))
+            if not bundling and not os.path.exists(output_dir):
                 os.makedirs(output_dir)
-                logger.info(f"Created output directory: {output_dir}")
+                logger.info("Created output directory: %s", output_dir)
 
-            logger.info(f"Reading source file: {self.source_path}")
-            df = pd.read_excel(self.source_path, header=5)
-            logger.info(f"Source file loaded. Columns: {df.columns.tolist()}")
-            logger.info(f"Total rows to process: {len(df)}")
+            # Fresh profiler per run, shared with the API handler for per-call timings
+            self.profiler = StageProfiler(enabled=self.profile)
+            self.api_handler.profiler = self.profiler
+            self.api_handler.reset_matches()
+            calls_before = dict(self.api_handler.call_counts)
+            cache = self.api_handler.cache
+            cache_before = (cache.hits, cache.misses) if cache is not None else None
+            index = self.api_handler.address_index
+            index_before = (index.hits, index.misses, index.lot_misses) if index is not None else None
 
-            processed_count = 0
-            for index, row in df.iterrows():
-                try:
-                    logger.info(f"Processing row {index + 1}...")
-                    
-                    # Extraction (Adjusted based on logs: B=1, C=2, D=3, E=4, G=6)
-                    raw_date = row.iloc[1]
-                    date_val, date_filename = self._format_date(raw_date)
-                    
-                    representative = str(row.iloc[2]).strip()
-                    company_name = str(row.iloc[3]).strip()
-                    address_ko = str(row.iloc[4]).strip()
-                    weight = str(row.iloc[6]).strip()
-
-                    # Console logs for debugging
-                    logger.info(f"--- Row Details ---")
-                    logger.info(f"Date (Col B? Index 2): {date_val}")
-                    logger.info(f"Representative (Col C? Index 3): {representative}")
-                    logger.info(f"Store Name (Col D? Index 4): {company_name}")
-                    logger.info(f"Address (Col E? Index 5): {address_ko}")
-                    logger.info(f"Weight (Col G? Index 7): {weight}")
-                    logger.info(f"-------------------")
-
-                    logger.debug(f"Row data: Company={company_name}, Date={date_val}, Weight={weight}")
-
-                    # Enrichment
-                    company_name_en = self.api_handler.get_romanized_text(company_name, is_company=True)
-                    phone, zip_code, address_en_fetched = self.api_handler.get_enriched_data(address_ko, company_name)
-                    
-                    # Use fetched English address if available, otherwise Romanize
-                    if address_en_fetched:
-                        address_en = address_en_fetched
-                        logger.info(f"Using actual English address from NCP: {address_en}")
-                    else:
-                        address_en = self.api_handler.get_romanized_text(address_ko)
-                        logger.info(f"Falling back to Romanized address: {address_en}")
-                    
-                    logger.info(f"Enriched Data -> Phone: {phone}, Zip: {zip_code}")
-
-                    # Loading Template
-                    wb = openpyxl.load_workbook(self.form_path)
-                    ws = wb["CORSIA"] if "CORSIA" in wb.sheetnames else wb.active
-                    logger.debug(f"Template loaded. active sheet: {ws.title}")
-
-                    # Filling via _safe_write (Handles Merged Cells)
-                    self._safe_write(ws, 'C4', f"{company_name_en} / {company_name}")
-                    self._safe_write(ws, 'C5', f"{address_en} / {address_ko}")
-                    self._safe_write(ws, 'C7', zip_code)
-                    self._safe_write(ws, 'C8', phone)
-                    self._safe_write(ws, 'B12', f"수거일 : {date_val}")
-                    self._safe_write(ws, 'C12', f"수거량 : {weight} kg")
-                    self._safe_write(ws, 'B13', f"DATE : {date_val}")
-                    self._safe_write(ws, 'C13', f"Quantity collected: {weight} kg")
-                    self._safe_write(ws, 'A22', f"{company_name}/{date_filename}")
-                    self._safe_write(ws, 'C22', representative)
-
-                    # Signature
-                    self._add_signature(ws)
-                    
-                    # Reinforce borders for F14, F16-19
-                    self._reinforce_borders(ws)
-
-
-                    # Save
-                    template_name = os.path.splitext(os.path.basename(self.form_path))[0]
-                    base_filename = f"{template_name}_{company_name}"
-                    
-                    # Prepend markers if data is missing
-                    if not phone:
-                        base_filename = f"전화번호_{base_filename}"
-                    if not zip_code:
-                        base_filename = f"우편_{base_filename}"
-
-                    save_filename = f"{base_filename}.xlsx"
-                    save_path = os.path.join(output_dir, save_filename)
-
-                    counter = 1
-                    while os.path.exists(save_path):
-                        save_filename = f"{base_filename}_{counter}.xlsx"
-                        save_path = os.path.join(output_dir, save_filename)
-                        logger.info(f"File exists, trying new name: {save_filename}")
-                        counter += 1
-                    
-                    wb.save(save_path)
-                    
-                    logger.info(f"Saved: {save_path}")
-                    processed_count += 1
-                    
-                    # Debugging: Stop after the first row as requested
-                    logger.info("Debug mode: Stopping after the first row.")
-                    # if processed_count == 3:
-                    #     break
-
-                except Exception as row_error:
-                    logger.error(f"Error in row {index + 1}: {row_error}", exc_info=True)
-                    continue
+            self.summary = {"timings": {"read": 0.0}}
+            timings = self.summary["timings"]
+            # Zip bundles get the validation report next to the archive instead of inside a folder
+            if bundling:
+                report = ValidationReport(f"{os.path.normpath(output_dir)}_{VALIDATION_REPORT_NAME}")
+            else:
+                report = ValidationReport(os.path.join(output_dir, VALIDATION_REPORT_NAME))
+
+            # Resume: skip rows whose content is unchanged since an earlier run into this folder
+            manifest = None
+            if self.resume and bundling:
+                logger.info("Resume is not available for zip bundles; rendering every row")
+            elif self.resume and not self.cancelled:
+                manifest = RunManifest(output_dir, file_digest(self.form_path), self.source_path)
+                self.summary["skipped"] = 0
 
-            logger.info(f"Processing complete. {processed_count} files generated.")
-            return processed_count, today_str
+            # rows read, the reader's expected row count, rows that will never be rendered
+            # (rejected, blank, unchanged) and the resume decisions
+            tally = {"rows": 0, "expected": 0, "dropped": 0, "render": 0, "retry": 0}
+
+            def expected_total():
+                """Rows expected to reach rendering, for progress (grows if the reader's count was low)."""
+                return max(tally["expected"], tally["rows"]) - tally["dropped"]
+
+            def set_expected(count):
+                tally["expected"] = count
+
+            def source_items():
+                """Reads, validates and resume-checks the source NORMALIZE_CHUNK_ROWS rows at a time.
+
+                Yields (record, manifest key, earlier entry to re-check) for every row to
+                render. Only the current chunk is held; its problems go straight to the report.
+                """
+                source_rows = iter_source_rows(self.source_path, mode=self.reader, on_total=set_expected)
+                complete = False
+                while not self.cancelled:
+                    started = time.perf_counter()
+                    with self.profiler.stage("read"):
+                        chunk = list(islice(source_rows, NORMALIZE_CHUNK_ROWS))
+                    tally["rows"] += len(chunk)
+                    if not self.pipeline:
+                        self._report_progress("read", tally["rows"], tally["rows"])
+                    # Dates, text and weights are normalized column-wise; invalid rows stop here
+                    with self.profiler.stage("normalize"):
+                        records, problems = normalize_rows(chunk)
+                    self._report_validation(report, problems)
+                    tally["dropped"] += len(chunk) - len(records)
+                    complete = len(chunk) < NORMALIZE_CHUNK_ROWS
+                    del chunk, problems
+                    items = []
+                    for record in records:
+                        # One compact line per row (date | store | representative | address | weight)
+                        logger.log(ROW, "Row %s: %s | %s | %s | %s | %s kg", record["row_number"],
+                                   record["date_val"], record["company_name"], record["representative"],
+                                   record["address_ko"], record["weight"])
+                        key, entry = None, None
+                        if manifest is not None:
+                            key, action, entry = manifest.check(record)
+                            if action == "skip":
+                                self.summary["skipped"] += 1
+                                tally["dropped"] += 1
+                                continue
+                            tally[action] += 1
+                        items.append((record, key, entry))
+                    del records
+                    timings["read"] += time.perf_counter() - started
+                    yield from items
+                    if complete:
+                        break
+                if manifest is not None and complete:
+                    logger.info("Resume: %s unchanged rows skipped, %s new/modified, %s incomplete to re-check",
+                                self.summary["skipped"], tally["render"], tally["retry"])
+                    # Every row has been checked, so outputs of rows whose old content is gone can go
+                    manifest.remove_superseded()
+
+            # Output names are fixed in row order (deterministic with any worker count)
+            reserved = {}
+            if bundling:
+                reserved[os.path.splitext(INDEX_NAME)[0]] = 1
+
+            def make_job(item, enrichment):
+                record, key, retry_entry = item
+                document = dict(record, manifest_key=key, **enrichment)
+                if retry_entry is not None:
+                    # Earlier output lacked phone/zip: replace it only if the lookup now does better
+                    if not (document["phone"] and document["zip_code"]):
+                        self.summary["skipped"] += 1
+                        return None
+                    manifest.remove(retry_entry)
+                # Chosen here, in row order, so a seeded run is reproducible with any worker count
+                document["signature_index"] = self.signatures.pick_index()
+                # Bundled names are only checked against this run's registry, never the disk
+                return document, self._reserve_save_path(document, output_dir, reserved, probe_disk=not bundling)
+
+            bundle = None
+
+            def on_finished(job, error, data):
+                """Stores a rendered document (data is None when the renderer already saved it).
+
+                Returns False if the row failed.
+                """
+                nonlocal bundle
+                document, save_path = job
+                if error is not None:
+                    return False
+                if bundling:
+                    if bundle is None:
+                        bundle = DocumentBundle(unused_archive_path(output_dir), write_index=self.bundle_index)
+                    with self.profiler.stage("bundle", document["row_number"]):
+                        bundle.add(os.path.basename(save_path), data, document)
+                elif data is not None:
+                    try:
+                        with self.profiler.stage("write", document["row_number"]):
+                            with open(save_path, "wb") as f:
+                                f.write(data)
+                    except OSError as e:
+                        logger.error("Error in row %s: %s", document["row_number"], e)
+                        return False
+                    logger.log(ROW, "Saved: %s", save_path)
+                if manifest is not None:
+                    manifest.record(document["manifest_key"], document["row_number"], save_path,
+                                    complete=bool(document["phone"] and document["zip_code"]))
+                return True
+
+            try:
+                if self.pipeline:
+                    # Reading, lookups, rendering and writing overlap row by row through bounded queues
+                    started = time.perf_counter()
+                    rendered, processed_count = self._run_pipeline(source_items(), make_job, on_finished,
+                                                                   expected_total)
+                    timings["pipeline"] = round(time.perf_counter() - started, 3)
+                else:
+                    # Pass 1: read and validate every row
+                    items = list(source_items())
+
+                    # Pass 2: enrich each unique store once, then fan the results back out to the rows
+                    started = time.perf_counter()
+                    enrichments = self._enrich_records([item[0] for item in items]) if not self.cancelled else []
+                    timings["enrich"] = round(time.perf_counter() - started, 3)
+
+                    # Pass 3: build every job up front, then render
+                    jobs = [make_job(item, enrichment) for item, enrichment in zip(items, enrichments)]
+                    started = time.perf_counter()
+                    errors = self._render_jobs([job for job in jobs if job is not None], on_finished)
+                    rendered, processed_count = len(errors), sum(1 for error in errors if error is None)
+                    timings["render"] = round(time.perf_counter() - started, 3)
+            finally:
+                timings["read"] = round(timings["read"], 3)
+                self._finish_validation(report)
+                if manifest is not None:
+                    manifest.close()
+                if bundle is not None:
+                    self.summary["archive"] = bundle.close()
+
+            self.summary["rows"] = tally["rows"]
+            self.summary["files"] = processed_count
+            self.summary["failed"] = report.counts["rejected_rows"] + rendered - processed_count
+            self.summary["api_calls"] = {provider: count - calls_before[provider]
+                                         for provider, count in self.api_handler.call_counts.items()}
+            self.summary["providers"] = self.api_handler.health_report()
+            for provider, health in self.summary["providers"].items():
+                if health["trips"]:
+                    logger.warning("%s was unavailable during the run: circuit opened %s time(s), "
+                                   "%s call(s) skipped",
+                                   provider, health["trips"], health["rejected"])
+            if index is not None:
+                hits, misses, lot_misses = (index.hits - index_before[0], index.misses - index_before[1],
+                                            index.lot_misses - index_before[2])
+                self.summary["address_index"] = {"hits": hits, "misses": misses, "lot_number_misses": lot_misses}
+                if lot_misses:
+                    logger.info("Address index: %s lot-number (지번) addresses were not in the index and went to NCP",
+                                lot_misses)
+            if cache is not None:
+                hits, misses = cache.hits - cache_before[0], cache.misses - cache_before[1]
+                self.summary["cache"] = {"hits": hits, "misses": misses,
+                                         "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None}
+            if self.profile:
+                self._report_stages()
+            if self.cancelled:
+                self.summary["cancelled"] = True
+                logger.warning("Processing cancelled after %s files.", processed_count)
+            logger.info("Processing complete. %s files generated.", processed_count)
+            logger.info("Run summary: %s", self.summary)
+            if bundle is not None:
+                return processed_count, os.path.basename(bundle.path)
+            return processed_count, os.path.basename(os.path.normpath(output_dir))
 
         except Exception as e:
-            logger.critical(f"Critical error in ExcelHandler: {e}", exc_info=True)
+            logger.critical("Critical error in ExcelHandler: %s", e, exc_info=True)
             raise e
+
+
+_NUMBERED_STEM_RE = re.compile(r"^(.*)_([1-9]\d*)$")
+
+def _name_taken(reserved, stem, counter):
+    """True if stem was already handed out this run under another base name.
+
+    reserved only holds a counter per base name, so "A_1" is taken either as the
+    plain name of a store called "A_1" or as the second name of a store "A".
+    """
+    if counter and reserved.get(stem, 0):
+        return True
+    match = _NUMBERED_STEM_RE.match(stem)
+    return bool(match) and reserved.get(match.group(1), 0) > int(match.group(2))
+
+
+# Render pool workers: each process keeps its own ExcelHandler (and parsed template)
+_worker_handler = None
+
+def _init_render_worker(log_queue, form_path, signature_dir, template_cache, engine, output_mode, profile):
+    global _worker_handler
+    setup_worker_logging(log_queue)
+    _worker_handler = ExcelHandler(None, form_path, signature_dir, None, template_cache=template_cache,
+                                   engine=engine, output_mode=output_mode, profile=profile)
+    _worker_handler._in_worker = True
+
+def _render_job(job):
+    return _worker_handler._render_job(job)
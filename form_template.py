@@ -0,0 +1,105 @@
+import io
+import pickle
+import openpyxl
+from openpyxl.utils import get_column_letter
+from openpyxl.styles.borders import Border, Side
+from logger import logger
+
+# Single source of truth for what goes where on the form.
+# Each entry is (target cell, format string filled from the row record).
+FIELD_MAP = (
+    ('C4', "{company_name_en} / {company_name}"),
+    ('C5', "{address_en} / {address_ko}"),
+    ('C7', "{zip_code}"),
+    ('C8', "{phone}"),
+    ('B12', "수거일 : {date_val}"),
+    ('C12', "수거량 : {weight} kg"),
+    ('B13', "DATE : {date_val}"),
+    ('C13', "Quantity collected: {weight} kg"),
+    ('A22', "{company_name}/{date_filename}"),
+    ('C22', "{representative}"),
+)
+
+# Cells that lose their border when the form is re-saved: (coordinate, side to enforce)
+BORDER_FIXES = (
+    ('F14', 'right'),
+    ('F16', 'right'),
+    ('F17', 'right'),
+    ('F18', 'right'),
+    ('F19', 'right'),
+    ('B22', 'top'),
+)
+
+class FormTemplate:
+    """Parses the form workbook once and compiles everything the per-row fill needs."""
+
+    def __init__(self, form_path):
+        self.form_path = form_path
+        with open(form_path, "rb") as f:
+            self.raw_bytes = f.read()
+
+        pristine = openpyxl.load_workbook(io.BytesIO(self.raw_bytes))
+        self._compile(self.target_sheet(pristine))
+
+        # The pristine workbook is pickled once; unpickling is a plain object
+        # rebuild and skips the zip/XML parsing that load_workbook repeats.
+        # (copy.deepcopy is not usable here: it corrupts openpyxl's IndexedList style tables.)
+        self._snapshot = None
+        try:
+            self._snapshot = pickle.dumps(pristine, protocol=pickle.HIGHEST_PROTOCOL)
+            logger.info("Form template cached in memory (%s bytes): %s", len(self._snapshot), form_path)
+        except Exception as e:
+            logger.warning("Template snapshot unavailable, falling back to in-memory reload: %s", e)
+
+    def _compile(self, ws):
+        """Precomputes merged-cell roots, write targets and reinforced borders from the pristine sheet."""
+        self.merged_roots = {}
+        for range_ in ws.merged_cells.ranges:
+            root_coord = range_.coord.split(':')[0]
+            for row_idx, col_idx in range_.cells:
+                self.merged_roots[f"{get_column_letter(col_idx)}{row_idx}"] = root_coord
+
+        # (root cell to assign, format string) in FIELD_MAP order
+        self.fill_plan = [(self.merged_roots.get(coord, coord), fmt) for coord, fmt in FIELD_MAP]
+
+        thin = Side(border_style="thin", color="000000")
+        self.border_plan = []
+        for coord, side in BORDER_FIXES:
+            existing = ws[coord].border
+            sides = {name: getattr(existing, name) for name in ('left', 'right', 'top', 'bottom')}
+            sides[side] = thin
+            border = Border(
+                diagonal=existing.diagonal,
+                diagonal_direction=existing.diagonal_direction,
+                outline=existing.outline,
+                vertical=existing.vertical,
+                horizontal=existing.horizontal,
+                **sides
+            )
+            self.border_plan.append((coord, border))
+
+        logger.debug("Template compiled: %s merged cells, %s fields, %s border fixes",
+                     len(self.merged_roots), len(self.fill_plan), len(self.border_plan))
+
+    def new_workbook(self):
+        """Returns a fresh, independent workbook equivalent to load_workbook(form_path)."""
+        if self._snapshot is not None:
+            return pickle.loads(self._snapshot)
+        return openpyxl.load_workbook(io.BytesIO(self.raw_bytes))
+
+    def fill(self, ws, record):
+        """Writes one row record into ws and re-applies the border fixes."""
+        self.fill_values(ws, record)
+        self.fill_borders(ws)
+
+    def fill_values(self, ws, record):
+        for root_coord, fmt in self.fill_plan:
+            ws[root_coord].value = fmt.format(**record)
+
+    def fill_borders(self, ws):
+        for coord, border in self.border_plan:
+            ws[coord].border = border
+
+    @staticmethod
+    def target_sheet(wb):
+        return wb["CORSIA"] if "CORSIA" in wb.sheetnames else wb.active
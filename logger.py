@@ -1,35 +1,143 @@
+import atexit
 import logging
+import multiprocessing
 import os
-from datetime import datetime
+import queue
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 
-def setup_logger():
-    """Sets up a logger that outputs to both console and a file."""
-    logger = logging.getLogger("ExcelProcessor")
-    logger.setLevel(logging.DEBUG)
+# Compact one-line-per-row records; between DEBUG and INFO so the console stays quiet
+ROW = 15
+logging.addLevelName(ROW, "ROW")
+
+LOG_DIR = "logs"
+LOG_FILE = "app.log"
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+class _DeferredOpenMixin:
+    """Opens the log file (creating its directory) on the first record instead of at setup."""
+
+    def _open(self):
+        directory = os.path.dirname(self.baseFilename)
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        return super()._open()
+
+class SizedTimedRotatingFileHandler(_DeferredOpenMixin, TimedRotatingFileHandler):
+    """Rotates at midnight, and also whenever the file grows past max_bytes."""
+
+    def __init__(self, filename, max_bytes=20 * 2 ** 20, backup_count=14, encoding="utf-8"):
+        super().__init__(filename, when="midnight", backupCount=backup_count, encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes and self.stream is not None:
+            self.stream.seek(0, 2)
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def rotation_filename(self, default_name):
+        # A size rollover can happen twice in one day: never overwrite an earlier backup
+        name, counter = default_name, 1
+        while os.path.exists(name):
+            name = f"{default_name}.{counter}"
+            counter += 1
+        return name
+
+class _LazyQueueHandler(QueueHandler):
+    """Enqueues the record as is, so %-formatting happens on the listener thread, not the caller's."""
+
+    def prepare(self, record):
+        return record
+
+def _level(name, default):
+    value = os.environ.get(name, "").upper()
+    return logging.getLevelName(value) if value and isinstance(logging.getLevelName(value), int) else default
 
-    # Create logs directory if it doesn't exist
-    if not os.path.exists("logs"):
-        os.makedirs("logs")
+def setup_logger(use_queue=None, file_level=None, console_level=None):
+    """Sets up a logger that outputs to both console and a file.
 
-    # File handler (logs/app_YYYYMMDD.log)
-    log_filename = f"logs/app_{datetime.now().strftime('%Y%m%d')}.log"
-    file_handler = logging.FileHandler(log_filename, encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
+    By default records go through a queue to a background listener thread that
+    does the formatting and file I/O (EXCEL_LOG_SYNC=1 writes synchronously).
+    The file (logs/app.log) rotates daily and at 20 MB, keeping 14 backups; it
+    records ROW and above unless EXCEL_LOG_LEVEL says otherwise (e.g. DEBUG).
+    """
+    logger = logging.getLogger("ExcelProcessor")
+    if logger.handlers:
+        return logger
+    # Child processes exit without running atexit, which would drop queued records: they log synchronously
+    is_child = multiprocessing.parent_process() is not None
+    if use_queue is None:
+        use_queue = not is_child and os.environ.get("EXCEL_LOG_SYNC", "") not in ("1", "true", "yes")
+    file_level = file_level or _level("EXCEL_LOG_LEVEL", ROW)
+    console_level = console_level or _level("EXCEL_CONSOLE_LOG_LEVEL", logging.INFO)
+
+    # The logs directory and file are only created when the first record is written, which keeps
+    # import time low. Only the main process writes the file: child processes get the console
+    # here, and render workers send their records to the main process (setup_worker_logging)
+    file_handler = None
+    if not is_child:
+        file_handler = SizedTimedRotatingFileHandler(os.path.join(LOG_DIR, LOG_FILE))
+        file_handler.setLevel(file_level)
 
     # Console handler
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
+    console_handler.setLevel(console_level)
 
     # Formatter
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [console_handler] if file_handler is None else [file_handler, console_handler]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Records below every handler's level are dropped before they are even created
+    logger.setLevel(min(file_level, console_level))
+    logger.propagate = False
+
+    if use_queue:
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)  # flushes whatever is still queued
+        logger.addHandler(_LazyQueueHandler(log_queue))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+
+    return logger
 
-    # Add handlers
-    if not logger.handlers:
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+class _MainLoggerHandler(logging.Handler):
+    """Hands records received from worker processes to this process's logger (and so its file)."""
 
+    def emit(self, record):
+        logging.getLogger("ExcelProcessor").handle(record)
+
+_worker_queue = None
+
+def worker_log_queue():
+    """The multiprocessing queue render workers log into, drained by a listener in this process.
+
+    Created on first use; pass it to setup_worker_logging in each worker. The
+    main process stays the only writer of logs/app.log, so rotation works while
+    workers run (on Windows a rename fails while another process has the file
+    open) and records from different processes never interleave mid-line.
+    """
+    global _worker_queue
+    if _worker_queue is None:
+        _worker_queue = multiprocessing.Queue()
+        listener = QueueListener(_worker_queue, _MainLoggerHandler())
+        listener.start()
+        atexit.register(listener.stop)
+    return _worker_queue
+
+def setup_worker_logging(log_queue):
+    """For render worker processes: drops the handlers inherited through fork or set up on import
+    and sends every record to the main process through log_queue (see worker_log_queue)."""
+    logger = logging.getLogger("ExcelProcessor")
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(log_queue))
     return logger
 
 # Global logger instance
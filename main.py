@@ -1,14 +1,19 @@
+from startup import StartupProfiler
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 import os
-import json
+import time
+import queue
+import threading
+import multiprocessing
 from logger import logger
-from api_utils import APIHandler
-from excel_processor import ExcelHandler
+from app_settings import PERFORMANCE_DEFAULTS, load_settings, save_settings, pipeline_queues
+# pandas, openpyxl, requests and the romanizer are only imported after the window is up (see startup.py)
 
 class ExcelProcessorApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, startup=None):
         super().__init__()
+        self.startup = startup or StartupProfiler()
 
         self.title("Excel Data Processor")
         self.geometry("600x800")
@@ -20,6 +25,7 @@ class ExcelProcessorApp(ctk.CTk):
         self.kakao_api_key = ""
         self.ncp_client_id = ""
         self.ncp_client_secret = ""
+        self.performance = dict(PERFORMANCE_DEFAULTS)
         
         self.load_settings()
         logger.info("Application started")
@@ -59,7 +65,28 @@ class ExcelProcessorApp(ctk.CTk):
         self.run_button = ctk.CTkButton(self.main_frame, text="📂 모든 정보를 설정해주세요", height=45, state="disabled", fg_color="#A0A0A0", text_color="white", command=self.process_excel)
         self.run_button.pack(fill="x")
 
+        # Progress (updated from the worker thread through progress_queue)
+        self.progress_bar = ctk.CTkProgressBar(self.main_frame, progress_color="#1FA1FF")
+        self.progress_bar.set(0)
+        self.progress_bar.pack(fill="x", pady=(15, 5))
+        self.progress_label = ctk.CTkLabel(self.main_frame, text="", font=("Malgun Gothic", 12), text_color="#666666")
+        self.progress_label.pack(fill="x")
+        self.cancel_button = ctk.CTkButton(self.main_frame, text="⏹ 중지", height=35, state="disabled", fg_color="#A0A0A0", text_color="white", command=self.cancel_processing)
+        self.cancel_button.pack(fill="x", pady=(5, 0))
+
+        self.progress_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker_thread = None
+        self.progress_stage = None
+        self.stage_started = 0.0
+
         self.update_api_status()
+        # Runs once the main loop has drawn the window
+        self.after(0, self._on_first_window)
+
+    def _on_first_window(self):
+        self.startup.first_window()
+        self.startup.warm_up()
 
     def create_section(self, parent, title_text, placeholder_text, button_command):
         section_frame = ctk.CTkFrame(parent, fg_color="white", corner_radius=0)
@@ -81,7 +108,7 @@ class ExcelProcessorApp(ctk.CTk):
         if path:
             self.source_file_path = path
             label.configure(text=os.path.basename(path), text_color="black")
-            logger.info(f"Source file selected: {path}")
+            logger.info("Source file selected: %s", path)
             self.save_settings()
             self.check_files_selected()
 
@@ -90,7 +117,7 @@ class ExcelProcessorApp(ctk.CTk):
         if path:
             self.form_file_path = path
             label.configure(text=os.path.basename(path), text_color="black")
-            logger.info(f"Form file selected: {path}")
+            logger.info("Form file selected: %s", path)
             self.save_settings()
             self.check_files_selected()
 
@@ -99,7 +126,7 @@ class ExcelProcessorApp(ctk.CTk):
         if path:
             self.signature_dir = path
             label.configure(text=os.path.basename(path), text_color="black")
-            logger.info(f"Signature directory selected: {path}")
+            logger.info("Signature directory selected: %s", path)
             self.save_settings()
             self.check_files_selected()
 
@@ -143,61 +170,197 @@ class ExcelProcessorApp(ctk.CTk):
         self.check_files_selected()
 
     def load_settings(self):
-        if os.path.exists("settings.json"):
-            try:
-                with open("settings.json", "r") as f:
-                    settings = json.load(f)
-                    self.kakao_api_key = settings.get("kakao_api_key", "")
-                    self.ncp_client_id = settings.get("ncp_client_id", "")
-                    self.ncp_client_secret = settings.get("ncp_client_secret", "")
-                    self.source_file_path = settings.get("source_file_path", "")
-                    self.form_file_path = settings.get("form_file_path", "")
-                    self.signature_dir = settings.get("signature_dir", "")
-            except Exception as e:
-                logger.error(f"Failed to load settings: {e}")
+        settings = load_settings()
+        self.kakao_api_key = settings.get("kakao_api_key", "")
+        self.ncp_client_id = settings.get("ncp_client_id", "")
+        self.ncp_client_secret = settings.get("ncp_client_secret", "")
+        self.source_file_path = settings.get("source_file_path", "")
+        self.form_file_path = settings.get("form_file_path", "")
+        self.signature_dir = settings.get("signature_dir", "")
+        for key in PERFORMANCE_DEFAULTS:
+            self.performance[key] = settings.get(key, self.performance[key])
 
     def save_settings(self):
-        try:
-            settings = {
-                "kakao_api_key": self.kakao_api_key, 
-                "ncp_client_id": self.ncp_client_id,
-                "ncp_client_secret": self.ncp_client_secret,
-                "source_file_path": self.source_file_path,
-                "form_file_path": self.form_file_path,
-                "signature_dir": self.signature_dir
-            }
-            with open("settings.json", "w") as f:
-                json.dump(settings, f)
-        except Exception as e:
-            logger.error(f"Failed to save settings: {e}")
+        save_settings({
+            "kakao_api_key": self.kakao_api_key,
+            "ncp_client_id": self.ncp_client_id,
+            "ncp_client_secret": self.ncp_client_secret,
+            "source_file_path": self.source_file_path,
+            "form_file_path": self.form_file_path,
+            "signature_dir": self.signature_dir,
+            **self.performance
+        })
 
     def check_files_selected(self):
         if not hasattr(self, 'run_button'):
             return
+        if self.is_processing():
+            return
             
         if all([self.source_file_path, self.form_file_path, self.signature_dir, self.kakao_api_key]):
             self.run_button.configure(state="normal", text="📊 추출 및 실행하기", fg_color="#1FA1FF")
         else:
             self.run_button.configure(state="disabled", text="📂 모든 정보를 설정해주세요", fg_color="#A0A0A0")
 
+    def is_processing(self):
+        return self.worker_thread is not None and self.worker_thread.is_alive()
+
     def process_excel(self):
+        if self.is_processing():
+            return
+        logger.info("Button 'Execute' clicked. Starting process...")
+        self.cancel_event.clear()
+        self.progress_stage = None
+        self.progress_bar.set(0)
+        self.progress_label.configure(text="준비 중...")
+        self.run_button.configure(state="disabled", text="⏳ 처리 중...", fg_color="#A0A0A0")
+        self.cancel_button.configure(state="normal", fg_color="#FF5A5A")
+
+        # The batch runs off the Tk main thread so the window stays responsive
+        self.worker_thread = threading.Thread(target=self._run_processing, name="excel-worker", daemon=True)
+        self.worker_thread.start()
+        self.after(100, self._poll_progress)
+
+    def cancel_processing(self):
+        if self.is_processing():
+            self.cancel_event.set()
+            self.cancel_button.configure(state="disabled", fg_color="#A0A0A0")
+            self.progress_label.configure(text="현재 행을 마치고 중지하는 중...")
+            logger.info("Cancel requested by user")
+
+    def _run_processing(self):
+        """Worker thread: runs the batch and reports back only through progress_queue."""
+        # Usually already imported by the warm-up thread; otherwise this waits for it
+        from api_utils import APIHandler
+        from enrichment_cache import EnrichmentCache, DEFAULT_CACHE_PATH
+        from address_index import AddressIndex
+        from excel_processor import ExcelHandler
+
+        cache = None
+        address_index = None
+        api_handler = None
         try:
-            logger.info("Button 'Execute' clicked. Starting process...")
+            perf = self.performance
+            index_path = perf["address_index_path"]
+            if index_path and os.path.exists(index_path):
+                address_index = AddressIndex(index_path)
+            elif index_path:
+                logger.warning("Address index not found, using NCP only: %s", index_path)
+            # Kept next to settings.json so re-runs of the same stores skip the APIs
+            cache = EnrichmentCache(
+                DEFAULT_CACHE_PATH,
+                ttl_days=perf["cache_ttl_days"],
+                negative_ttl_days=perf["cache_negative_ttl_days"],
+                max_entries=perf["cache_max_entries"]
+            )
             api_handler = APIHandler(
                 ncp_client_id=self.ncp_client_id,
                 ncp_client_secret=self.ncp_client_secret,
-                kakao_api_key=self.kakao_api_key
+                kakao_api_key=self.kakao_api_key,
+                cache=cache,
+                address_index=address_index,
+                ncp_rps=perf["ncp_rps"],
+                ncp_concurrency=perf["ncp_concurrency"],
+                kakao_rps=perf["kakao_rps"],
+                kakao_concurrency=perf["kakao_concurrency"],
+                max_retries=perf["api_max_retries"],
+                breaker_threshold=perf["circuit_failure_threshold"],
+                breaker_cooldown=perf["circuit_cooldown_seconds"],
+                kakao_mode=perf["kakao_lookup"],
+                kakao_size=perf["kakao_page_size"],
+                match_threshold=perf["kakao_match_threshold"]
             )
-            excel_handler = ExcelHandler(self.source_file_path, self.form_file_path, self.signature_dir, api_handler)
-            
+            excel_handler = ExcelHandler(self.source_file_path, self.form_file_path, self.signature_dir, api_handler,
+                                         enrich_workers=perf["enrich_workers"],
+                                         render_workers=perf["render_workers"],
+                                         pipeline=perf["pipeline"],
+                                         pipeline_queues=pipeline_queues(perf),
+                                         reader=perf["source_reader"],
+                                         engine=perf["render_engine"],
+                                         output_mode=perf["output_mode"],
+                                         bundle_index=perf["bundle_index"],
+                                         profile=perf["profile"],
+                                         progress_callback=lambda stage, done, total: self.progress_queue.put(("progress", stage, done, total)),
+                                         cancel_token=self.cancel_event,
+                                         resume=perf["resume_runs"],
+                                         signature_seed=perf["signature_seed"])
+
             count, folder = excel_handler.process()
-            
-            messagebox.showinfo("완료", f"데이터 처리가 완료되었습니다!\n총 {count}개의 파일이 '{folder}' 폴더에 저장되었습니다.")
-            logger.info("Excel processing successful.")
+            self.progress_queue.put(("done", count, folder, excel_handler.summary.get("cancelled", False)))
         except Exception as e:
-            logger.critical(f"Process failed: {e}", exc_info=True)
-            messagebox.showerror("오류", f"처리 중 오류가 발생했습니다. 로그 파일을 확인해주세요.\n\n{str(e)}")
+            logger.critical("Process failed: %s", e, exc_info=True)
+            self.progress_queue.put(("error", str(e)))
+        finally:
+            if api_handler is not None:
+                api_handler.close()
+            if cache is not None:
+                cache.close()
+            if address_index is not None:
+                address_index.close()
+
+    def _poll_progress(self):
+        """Main thread: drains progress_queue and updates the widgets."""
+        latest = None
+        try:
+            while True:
+                message = self.progress_queue.get_nowait()
+                if message[0] == "progress":
+                    latest = message
+                else:
+                    if latest:
+                        self._show_progress(*latest[1:])
+                    self._finish_processing(message)
+                    return
+        except queue.Empty:
+            pass
+        if latest:
+            self._show_progress(*latest[1:])
+        self.after(100, self._poll_progress)
+
+    def _show_progress(self, stage, done, total):
+        now = time.monotonic()
+        if stage != self.progress_stage:
+            self.progress_stage = stage
+            self.stage_started = now
+        if self.cancel_event.is_set():
+            return
+
+        stage_names = {"read": "엑셀 읽는 중", "enrich": "주소/전화번호 조회", "render": "파일 생성"}
+        elapsed = now - self.stage_started
+        rate = done / elapsed if elapsed > 0 else 0
+        text = f"{stage_names.get(stage, stage)} {done}/{total}"
+        if rate > 0 and stage != "read":
+            eta = (total - done) / rate
+            text += f" · {rate:.1f}건/초 · 남은 시간 약 {int(eta // 60)}분 {int(eta % 60)}초"
+        self.progress_bar.set(done / total if total else 0)
+        self.progress_label.configure(text=text)
+
+    def _finish_processing(self, message):
+        self.worker_thread = None
+        self.cancel_button.configure(state="disabled", fg_color="#A0A0A0")
+        self.check_files_selected()
+
+        if message[0] == "done":
+            _, count, folder, cancelled = message
+            # zip bundles report the archive name instead of a folder
+            where = f"'{folder}' 압축 파일" if folder.endswith(".zip") else f"'{folder}' 폴더"
+            if cancelled:
+                self.progress_label.configure(text=f"중지됨 ({count}개 생성)")
+                messagebox.showinfo("중지", f"작업이 중지되었습니다.\n중지 전까지 {count}개의 파일이 {where}에 저장되었습니다.")
+            else:
+                self.progress_bar.set(1)
+                self.progress_label.configure(text=f"완료 ({count}개 생성)")
+                messagebox.showinfo("완료", f"데이터 처리가 완료되었습니다!\n총 {count}개의 파일이 {where}에 저장되었습니다.")
+            logger.info("Excel processing successful.")
+        else:
+            self.progress_label.configure(text="오류 발생")
+            messagebox.showerror("오류", f"처리 중 오류가 발생했습니다. 로그 파일을 확인해주세요.\n\n{message[1]}")
 
 if __name__ == "__main__":
-    app = ExcelProcessorApp()
+    # Required for the render process pool in the frozen (PyInstaller) build
+    multiprocessing.freeze_support()
+    startup = StartupProfiler()
+    startup.mark("imports")
+    app = ExcelProcessorApp(startup)
+    startup.mark("window_built")
     app.mainloop()
@@ -0,0 +1,68 @@
+import io
+import os
+import zipfile
+import openpyxl
+from logger import logger, ROW
+
+INDEX_NAME = "index.xlsx"
+INDEX_HEADER = ("파일명", "행", "상호", "대표자", "수거일", "전화번호", "우편번호")
+
+def unused_archive_path(output_dir):
+    """<output_dir>.zip, or <output_dir>_N.zip if an earlier run already wrote one."""
+    base = os.path.normpath(output_dir)
+    path = f"{base}.zip"
+    counter = 1
+    while os.path.exists(path):
+        path = f"{base}_{counter}.zip"
+        counter += 1
+    return path
+
+class DocumentBundle:
+    """Streams generated documents into one ZIP archive instead of one file each.
+
+    Entries are written as they arrive (stored, since .xlsx is already deflated)
+    into <path>.part, which is renamed to path on close, so a crashed run never
+    leaves a truncated archive under the final name.
+    """
+
+    def __init__(self, path, write_index=True):
+        self.path = path
+        self.write_index = write_index
+        self.count = 0
+        self.index_rows = []  # INDEX_HEADER values per entry, in archive order (only when write_index)
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._partial = path + ".part"
+        self._zip = zipfile.ZipFile(self._partial, "w", zipfile.ZIP_STORED, allowZip64=True)
+        logger.info("Writing documents into archive: %s", path)
+
+    def add(self, name, data, document):
+        self._zip.writestr(name, data)
+        self.count += 1
+        if self.write_index:
+            self.index_rows.append((name, document["row_number"], document["company_name"],
+                                    document["representative"], document["date_val"], document["phone"],
+                                    document["zip_code"]))
+        logger.log(ROW, "Added to archive: %s", name)
+
+    def _index_bytes(self):
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("index")
+        ws.append(INDEX_HEADER)
+        for row in self.index_rows:
+            ws.append(row)
+        buf = io.BytesIO()
+        wb.save(buf)
+        return buf.getvalue()
+
+    def close(self):
+        """Adds the index sheet (if enabled), finishes the archive and moves it into place."""
+        try:
+            if self.index_rows:
+                self._zip.writestr(INDEX_NAME, self._index_bytes(), zipfile.ZIP_DEFLATED)
+        finally:
+            self._zip.close()
+        os.replace(self._partial, self.path)
+        logger.info("Archive complete: %s (%s documents)", self.path, self.count)
+        return self.path
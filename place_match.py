@@ -0,0 +1,80 @@
+import math
+import re
+from difflib import SequenceMatcher
+from address_index import short_sido
+
+_CORPORATE_RE = re.compile(r"\(주\)|㈜|주식회사|\(유\)|유한회사")
+_PUNCT_RE = re.compile(r"[\s\-_.,·()\[\]&'\"/]+")
+
+def normalize_name(name):
+    """Store name without spaces, punctuation and corporate markers, lowercased."""
+    return _PUNCT_RE.sub("", _CORPORATE_RE.sub("", str(name or ""))).lower()
+
+def distance_m(x1, y1, x2, y2):
+    """Great-circle distance in metres between two (longitude, latitude) points."""
+    lon1, lat1, lon2, lat2 = map(math.radians, (x1, y1, x2, y2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000 * math.asin(min(1.0, math.sqrt(a)))
+
+class PlaceRanker:
+    """Scores Kakao keyword-search candidates against the store we are looking for.
+
+    score = weighted mean of name similarity, region match (province, then
+    city/district against the source address) and closeness to the NCP
+    geocoded point (1 at the same spot, 0.5 at distance_scale metres). Without
+    coordinates the distance term is left out and the others are re-weighted.
+    """
+
+    def __init__(self, threshold=0.6, weights=(0.6, 0.2, 0.2), distance_scale=1000.0):
+        self.threshold = threshold
+        self.weights = weights
+        self.distance_scale = distance_scale
+
+    def name_score(self, company_name, place_name):
+        wanted, found = normalize_name(company_name), normalize_name(place_name)
+        if not wanted or not found:
+            return 0.0
+        if wanted == found:
+            return 1.0
+        ratio = SequenceMatcher(None, wanted, found).ratio()
+        # "맛있는치킨" vs "맛있는치킨 강남점": the brand matches, the branch suffix differs
+        if wanted in found or found in wanted:
+            ratio = max(ratio, 0.85)
+        return ratio
+
+    @staticmethod
+    def region_score(address, document):
+        tokens = str(address or "").split()
+        place_tokens = (document.get("road_address_name") or document.get("address_name") or "").split()
+        if not tokens or not place_tokens:
+            return 0.0
+        if short_sido(tokens[0]) != short_sido(place_tokens[0]):
+            return 0.0
+        districts = [t for t in tokens[1:3] if t.endswith(("시", "군", "구"))]
+        if not districts:
+            return 1.0
+        return 0.5 + 0.5 * (sum(t in place_tokens for t in districts) / len(districts))
+
+    def distance_score(self, origin, document):
+        try:
+            meters = distance_m(origin[0], origin[1], float(document["x"]), float(document["y"]))
+        except (KeyError, TypeError, ValueError):
+            return 0.0
+        return 1.0 / (1.0 + meters / self.distance_scale)
+
+    def score(self, company_name, address, document, origin=None):
+        name_w, region_w, distance_w = self.weights
+        total = name_w * self.name_score(company_name, document.get("place_name"))
+        total += region_w * self.region_score(address, document)
+        if origin is None:
+            return total / (name_w + region_w)
+        return (total + distance_w * self.distance_score(origin, document)) / (name_w + region_w + distance_w)
+
+    def best(self, company_name, address, documents, origin=None):
+        """(document, score) of the highest-scoring candidate, or (None, 0.0) for no candidates."""
+        best_document, best_score = None, 0.0
+        for document in documents:
+            score = self.score(company_name, address, document, origin)
+            if best_document is None or score > best_score:
+                best_document, best_score = document, score
+        return best_document, round(best_score, 3)
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from logger import logger
+
+_NULL_STAGE = nullcontext()
+
+class _Stage:
+    __slots__ = ("profiler", "name", "row", "start")
+
+    def __init__(self, profiler, name, row):
+        self.profiler = profiler
+        self.name = name
+        self.row = row
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.add(self.name, self.start, time.perf_counter() - self.start, self.row)
+        return False
+
+class StageProfiler:
+    """Collects per-stage timings (and counters) for one run.
+
+    Usage: ``with profiler.stage("save", row=12): ...``. A disabled profiler hands
+    out one shared no-op context, so instrumented code costs a method call.
+    Events are (name, start, duration, pid, thread id, row) with perf_counter
+    start times, which are comparable across the render worker processes.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+        self.counters = {}
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def stage(self, name, row=None):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, row)
+
+    def add(self, name, start, duration, row=None):
+        event = (name, start, duration, os.getpid(), threading.get_ident(), row)
+        with self._lock:
+            self.events.append(event)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def drain(self):
+        """Returns and clears the recorded events (used to ship worker timings to the main process)."""
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    def merge(self, events):
+        if events:
+            with self._lock:
+                self.events.extend(events)
+
+    def summary(self):
+        """{stage: {count, total, p50, p95, max}} in seconds, in first-seen order."""
+        durations = {}
+        for name, _, duration, _, _, _ in self.events:
+            durations.setdefault(name, []).append(duration)
+        table = {}
+        for name, values in durations.items():
+            values.sort()
+            table[name] = {
+                "count": len(values),
+                "total": round(sum(values), 4),
+                "p50": round(_percentile(values, 50), 4),
+                "p95": round(_percentile(values, 95), 4),
+                "max": round(values[-1], 4),
+            }
+        return table
+
+    def format_table(self, extra=None):
+        """The summary as a fixed-width text table, followed by counters and any extra key/values."""
+        lines = [f"{'stage':<16}{'count':>8}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, row in self.summary().items():
+            lines.append(f"{name:<16}{row['count']:>8}{row['total']:>10.3f}{row['p50'] * 1000:>10.1f}"
+                         f"{row['p95'] * 1000:>10.1f}{row['max'] * 1000:>10.1f}")
+        for name, value in list(self.counters.items()) + list((extra or {}).items()):
+            lines.append(f"{name}: {value}")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Writes the events as a Chrome trace (.json, open in chrome://tracing or Perfetto) or as JSON lines."""
+        if path.endswith(".jsonl"):
+            with open(path, "w", encoding="utf-8") as f:
+                for name, start, duration, pid, tid, row in self.events:
+                    f.write(json.dumps({"stage": name, "start": round(start - self.origin, 6),
+                                        "duration": round(duration, 6), "pid": pid, "tid": tid, "row": row}) + "\n")
+        else:
+            trace = [{"name": name, "ph": "X", "ts": round((start - self.origin) * 1e6, 1),
+                      "dur": round(duration * 1e6, 1), "pid": pid, "tid": tid,
+                      "args": {"row": row} if row is not None else {}}
+                     for name, start, duration, pid, tid, row in self.events]
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+        logger.info("Stage trace written: %s (%s events)", path, len(self.events))
+
+# Shared disabled instance for code that runs without a profiler
+NULL_PROFILER = StageProfiler(enabled=False)
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
@@ -0,0 +1,61 @@
+from functools import lru_cache
+import pandas as pd
+from korean_romanizer.romanizer import Romanizer
+from logger import logger
+
+class RomanizationService:
+    """Memoized Korean -> English romanization with the business naming rules.
+
+    Whole strings are memoized by (text, is_company). Below that, every
+    space-separated token (시/도, 구, 로/길 segments, ...) is romanized once and
+    reused: korean_romanizer applies its pronunciation rules within a word
+    only, so romanizing token by token gives the same result as the whole string.
+    """
+
+    def __init__(self, maxsize=10000, token_maxsize=50000):
+        self._romanize_cached = lru_cache(maxsize=maxsize)(self._romanize_uncached)
+        self._token_cached = lru_cache(maxsize=token_maxsize)(self._romanize_token)
+
+    def romanize(self, text, is_company=False):
+        """Converts Korean text to English Romanization with business naming rules."""
+        if not text or not isinstance(text, str) or text.lower() == 'nan':
+            return ""
+        try:
+            return self._romanize_cached(text, is_company)
+        except Exception as e:
+            logger.error("Romanization error for '%s': %s", text, e, exc_info=True)
+            return text
+
+    def romanize_series(self, series, is_company=False):
+        """Romanizes a whole pandas Series, converting each distinct value once."""
+        codes, uniques = pd.factorize(series)
+        romanized = [self.romanize(value, is_company) for value in uniques]
+        # factorize marks missing values with -1; they romanize to ""
+        return pd.Series([romanized[code] if code >= 0 else "" for code in codes], index=series.index, dtype=object)
+
+    def cache_info(self):
+        return {"text": self._romanize_cached.cache_info(), "token": self._token_cached.cache_info()}
+
+    def _romanize_uncached(self, text, is_company):
+        processed_text = text
+        if is_company:
+            # Business naming rules
+            if processed_text.endswith("점"):
+                processed_text = processed_text[:-1] + " Branch"
+            if processed_text == "본점":
+                processed_text = "Headquarters"
+            elif "본점" in processed_text:
+                processed_text = processed_text.replace("본점", " Headquarters")
+
+        romanized = " ".join(self._token_cached(token) for token in processed_text.split(" "))
+
+        # Capitalize every word
+        if romanized:
+            romanized = ' '.join(word[0].upper() + word[1:] if word else "" for word in romanized.split())
+
+        logger.debug("Romanized (is_company=%s): %s -> %s", is_company, text, romanized)
+        return romanized
+
+    @staticmethod
+    def _romanize_token(token):
+        return Romanizer(token).romanize() if token else ""
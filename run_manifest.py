@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from logger import logger
+
+MANIFEST_NAME = ".run_manifest.jsonl"
+
+# Source fields that define a row's content; any change makes the row "modified"
+HASHED_FIELDS = ("company_name", "address_ko", "date_val", "representative", "weight")
+
+def manifest_source(output_dir):
+    """Absolute path of the source workbook a folder's manifest was written for (None if unknown)."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.loads(f.readline()).get("source")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def resume_dir(root, source_path, taken=()):
+    """Stable output folder for a source under root, so re-importing it on a later day resumes.
+
+    <root>/<workbook name>, or <workbook name>_2, _3... when that folder's manifest
+    belongs to another workbook (or the folder is in taken, i.e. already used in
+    this batch). A folder only ever holds one source's outputs, so stale-row
+    removal never touches another workbook's files.
+    """
+    source = os.path.abspath(source_path)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    name, counter = stem, 1
+    while True:
+        folder = os.path.join(root, name)
+        if folder not in taken and manifest_source(folder) in (None, source):
+            return folder
+        counter += 1
+        name = f"{stem}_{counter}"
+
+def file_digest(path):
+    """SHA-1 of a file's bytes (used to invalidate the manifest when the form changes)."""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+class RunManifest:
+    """Append-only journal of rendered rows in an output directory.
+
+    Each line records a row key (content hash + occurrence number, so identical
+    rows still get one document each), the source row number and the output file.
+    Re-runs skip rows whose key already has a complete output on disk.
+    """
+
+    def __init__(self, output_dir, form_digest="", source_path=None):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.form_digest = form_digest
+        self.entries = {}  # key -> entry
+        self._lock = threading.Lock()
+        # Per-run state of check(): occurrences per content hash, keys seen, superseded candidates
+        self._occurrences = {}
+        self._seen = set()
+        self._superseded = {}
+        self._by_row = None
+        new = not os.path.exists(self.path)
+        self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+        if new and source_path:
+            # First line names the source workbook (see resume_dir)
+            self._append({"source": os.path.abspath(source_path)})
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash can leave a partial last line; everything before it is still valid
+                    continue
+                if "key" not in entry:
+                    continue  # the source header line
+                if entry.get("removed"):
+                    self.entries.pop(entry["key"], None)
+                else:
+                    self.entries[entry["key"]] = entry
+        logger.info("Run manifest loaded: %s rendered rows in %s", len(self.entries), self.path)
+
+    def row_key(self, record):
+        """Key of the next record in source order: hash of the form and row content plus its occurrence count."""
+        payload = json.dumps([self.form_digest] + [str(record.get(f, "")) for f in HASHED_FIELDS], ensure_ascii=False)
+        digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        self._occurrences[digest] = self._occurrences.get(digest, 0) + 1
+        return f"{digest}:{self._occurrences[digest]}"
+
+    def check(self, record):
+        """Decides what one record needs; call it for every record, in source order.
+
+        Returns (key, action, entry):
+          "skip"   - unchanged with a complete output on disk
+          "retry"  - entry's output lacked a phone or zip code; the row is re-enriched
+                     and only re-rendered if that improves
+          "render" - new or modified (entry is None)
+        An earlier entry for the same row number with other content is only
+        superseded if that content does not come back elsewhere in the source, so
+        it is removed by remove_superseded() once every record has been checked.
+        """
+        if self._by_row is None:
+            self._by_row = {entry["row"]: entry for entry in self.entries.values()}
+        key = self.row_key(record)
+        self._seen.add(key)
+        entry = self.entries.get(key)
+        if entry and os.path.exists(os.path.join(self.output_dir, entry["file"])):
+            return key, "skip" if entry.get("complete") else "retry", entry
+        if entry:
+            self.remove(entry)  # its output is gone; the row is rendered again
+        previous = self._by_row.get(record["row_number"])
+        if previous and previous["key"] != key:
+            self._superseded[previous["key"]] = previous
+        return key, "render", None
+
+    def remove_superseded(self):
+        """Removes the earlier outputs of modified rows whose old content was not seen in this run.
+
+        Only valid once every source record went through check() (not after a cancelled read).
+        """
+        stale = [entry for key, entry in self._superseded.items() if key not in self._seen and key in self.entries]
+        for entry in stale:
+            self.remove(entry)
+        self._superseded = {}
+        return len(stale)
+
+    def remove(self, entry):
+        """Deletes a superseded output file and journals its removal."""
+        path = os.path.join(self.output_dir, entry["file"])
+        if os.path.exists(path):
+            os.remove(path)
+            logger.info("Removed superseded output: %s", path)
+        self._append({"key": entry["key"], "removed": True})
+        self.entries.pop(entry["key"], None)
+
+    def record(self, key, row_number, save_path, complete):
+        entry = {"key": key, "row": row_number, "file": os.path.basename(save_path),
+                 "complete": complete, "ts": round(time.time(), 3)}
+        self._append(entry)
+        self.entries[key] = entry
+
+    def _append(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,69 @@
+import io
+import os
+import random
+from PIL import Image as PILImage
+from openpyxl.drawing.image import Image as XLImage
+from logger import logger
+
+SIGNATURE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+class PooledImage(XLImage):
+    """openpyxl image backed by ready-made PNG bytes (no PIL work at save time)."""
+
+    def __init__(self, data, width, height):
+        self.ref = None
+        self._png = data
+        self.format = "png"
+        self.width, self.height = width, height
+
+    def _data(self):
+        return self._png
+
+class SignaturePool:
+    """Signature images loaded once, resized and PNG-encoded, then handed out from memory.
+
+    Images are stored at oversample x the on-sheet size (200x33) so they stay sharp
+    when printed while still being far smaller than the original scans.
+    """
+
+    def __init__(self, signature_dir, width=200, height=33, oversample=2, seed=None):
+        self.signature_dir = signature_dir
+        self.width = width
+        self.height = height
+        self._rng = random.Random(seed)
+        self.images = []  # (file name, PNG bytes)
+
+        try:
+            names = sorted(f for f in os.listdir(signature_dir) if f.lower().endswith(SIGNATURE_EXTENSIONS))
+        except Exception as e:
+            logger.error("Failed to read signature directory: %s", e)
+            names = []
+
+        for name in names:
+            try:
+                with PILImage.open(os.path.join(signature_dir, name)) as img:
+                    if img.mode not in ("RGB", "RGBA", "L", "LA"):
+                        img = img.convert("RGBA")
+                    resized = img.resize((width * oversample, height * oversample), PILImage.LANCZOS)
+                    buf = io.BytesIO()
+                    resized.save(buf, format="PNG", optimize=True)
+                self.images.append((name, buf.getvalue()))
+            except Exception as e:
+                logger.error("Failed to load signature '%s': %s", name, e)
+
+        if self.images:
+            total = sum(len(data) for _, data in self.images)
+            logger.info("Signature pool loaded: %s images, %s bytes", len(self.images), total)
+        else:
+            logger.warning("No signature files found in directory.")
+
+    def pick_index(self):
+        """Random index into images (reproducible when a seed was given), or None if empty."""
+        if not self.images:
+            return None
+        return self._rng.randrange(len(self.images))
+
+    def image(self, index):
+        """A new openpyxl image for images[index], sized for the sheet."""
+        name, data = self.images[index]
+        return PooledImage(data, self.width, self.height)
@@ -0,0 +1,101 @@
+import re
+from collections import namedtuple
+import openpyxl
+import pandas as pd
+from logger import logger
+
+HEADER_ROW = 5  # 0-based, same as pd.read_excel(header=5)
+
+SourceRow = namedtuple("SourceRow", ["row_number", "date", "representative", "company", "address", "weight"])
+
+# Header names accepted for each field (matched after removing spaces, case-insensitive).
+# LEGACY_POSITIONS is used for any field whose header is not found (B=1, C=2, D=3, E=4, G=6).
+COLUMN_ALIASES = {
+    "date": ("수거일", "수거일자", "수거날짜", "일자", "날짜", "date"),
+    "representative": ("대표자", "대표자명", "대표", "성명", "representative"),
+    "company": ("상호", "상호명", "업소명", "업체명", "매장명", "company", "store"),
+    "address": ("주소", "소재지", "사업장주소", "address"),
+    "weight": ("수거량", "수거량(kg)", "중량", "weight"),
+}
+LEGACY_POSITIONS = {"date": 1, "representative": 2, "company": 3, "address": 4, "weight": 6}
+
+def _normalize_header(value):
+    return re.sub(r"\s+", "", str(value)).lower() if value is not None else ""
+
+def resolve_columns(header):
+    """Maps each field to a column index by header name, falling back to the legacy fixed positions."""
+    names = [_normalize_header(h) for h in header]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        # Exact match first, then a header that starts with one of the aliases
+        match = next((i for i, name in enumerate(names) if name in aliases), None)
+        if match is None:
+            match = next((i for i, name in enumerate(names) if name and name.startswith(aliases)), None)
+        if match is None or match in columns.values():
+            match = LEGACY_POSITIONS[field]
+        columns[field] = match
+    logger.info("Source columns resolved: %s", columns)
+    return columns
+
+def _to_row(row_number, values, columns):
+    def get(field):
+        index = columns[field]
+        return values[index] if index < len(values) else None
+    return SourceRow(row_number, get("date"), get("representative"), get("company"), get("address"), get("weight"))
+
+def iter_pandas_rows(path, header_row=HEADER_ROW, on_total=None):
+    """Reads the whole sheet with pandas (original behaviour) and yields SourceRow tuples."""
+    df = pd.read_excel(path, header=header_row)
+    logger.info("Source file loaded. Columns: %s", df.columns.tolist())
+    logger.info("Total rows to process: %s", len(df))
+    if on_total is not None:
+        on_total(len(df))
+    columns = resolve_columns(df.columns)
+    for index, values in enumerate(df.itertuples(index=False, name=None)):
+        yield _to_row(index + 1, values, columns)
+
+def iter_stream_rows(path, header_row=HEADER_ROW, on_total=None):
+    """Streams the first sheet with openpyxl read_only mode, one row at a time.
+
+    Unlike iter_pandas_rows it never holds the whole workbook or a DataFrame of
+    it. ExcelHandler's pipeline consumes it lazily, a chunk at a time, so with
+    this reader the memory of a run does not grow with the size of the sheet.
+
+    Empty cells come back as NaN like pandas, and trailing blank rows are dropped
+    the same way pd.read_excel drops them. Cell values keep their native type
+    (pandas would turn an int column with a blank cell into floats).
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        if on_total is not None and ws.max_row:
+            # From the sheet's declared dimension, so it can include trailing blank rows
+            on_total(max(0, ws.max_row - header_row - 1))
+        rows = ws.iter_rows(min_row=header_row + 1, values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = resolve_columns(header)
+
+        row_number = 0
+        pending_blank = []  # blank rows are only emitted once a non-blank row follows them
+        for values in rows:
+            values = tuple(float("nan") if v is None else v for v in values)
+            row_number += 1
+            if all(isinstance(v, float) and v != v for v in values):
+                pending_blank.append(_to_row(row_number, values, columns))
+                continue
+            yield from pending_blank
+            pending_blank = []
+            yield _to_row(row_number, values, columns)
+    finally:
+        wb.close()
+
+READERS = {"pandas": iter_pandas_rows, "stream": iter_stream_rows}
+
+def iter_source_rows(path, mode="pandas", header_row=HEADER_ROW, on_total=None):
+    """Yields the source's SourceRows; on_total(count) is called with the expected row count once known."""
+    if mode not in READERS:
+        raise ValueError(f"Unknown source reader '{mode}' (expected one of {sorted(READERS)})")
+    logger.info("Reading source file (%s): %s", mode, path)
+    return READERS[mode](path, header_row, on_total)
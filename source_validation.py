@@ -0,0 +1,135 @@
+import pandas as pd
+from logger import logger
+
+VALIDATION_REPORT_NAME = "validation_report.csv"
+REPORT_COLUMNS = ("row", "severity", "field", "problem", "value")
+
+# Text cells that mean "empty" once stringified (pandas NaN, None, NaT)
+_NULL_TEXT = ("nan", "none", "nat", "null", "<na>")
+_DATE_DASHED = r"^(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})(?:$|[ T])"
+_DATE_COMPACT = r"^(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})(?:\.0)?$"
+
+def clean_text(series):
+    """Stripped strings with NaN/None/"nan" (and all-blank cells) turned into ""."""
+    text = series.astype("string").str.strip()
+    return text.mask(text.str.lower().isin(_NULL_TEXT)).fillna("").astype(object)
+
+def parse_dates(series):
+    """datetime64 Series (NaT where unparseable) from Timestamps, datetimes and
+    "2024-06-01" / "2024.6.1" / "2024/06/01" / "20240601" text, without a Python-level loop."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.normalize()
+    text = clean_text(series).astype("string").str.replace(r"\s*[./]\s*", "-", regex=True).str.strip("-")
+    parts = text.str.extract(_DATE_DASHED)
+    compact = text.str.extract(_DATE_COMPACT)
+    parts = parts.fillna(compact)
+    numbers = parts.apply(pd.to_numeric, errors="coerce").astype(float)
+    return pd.to_datetime(numbers[["year", "month", "day"]], errors="coerce")
+
+def parse_weights(series):
+    """Float Series from numbers and "1,200" / "12 kg" text; NaN where it is not a number."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    text = clean_text(series).astype("string").str.replace(r"[,\s]|(?i:kg)$", "", regex=True)
+    return pd.to_numeric(text, errors="coerce")
+
+def format_weights(weights):
+    """12.0 -> "12", 12.5 -> "12.5" (rounded to 3 decimals); NaN -> "".
+
+    Fixed-point text, so huge values are written out in full (1e20 -> "100000000000000000000")
+    instead of overflowing an integer cast or switching to exponent notation.
+    """
+    known = weights.notna()
+    formatted = pd.Series("", index=weights.index, dtype=object)
+    formatted[known] = weights[known].map("{:.3f}".format).astype(str).str.rstrip("0").str.rstrip(".")
+    return formatted
+
+def normalize_rows(source_rows):
+    """One columnar pass over the SourceRows: returns (records, problems).
+
+    records holds one dict per valid row (the fields ExcelHandler renders from);
+    problems is a DataFrame (REPORT_COLUMNS) of every error and warning. Rows
+    with an error are left out of records, so they never reach the APIs or the
+    renderer; blank rows are dropped and reported as warnings.
+    """
+    df = pd.DataFrame(list(source_rows), columns=["row_number", "date", "representative", "company",
+                                                  "address", "weight"])
+    frame = pd.DataFrame({
+        "row_number": df["row_number"],
+        "company_name": clean_text(df["company"]),
+        "address_ko": clean_text(df["address"]),
+        "representative": clean_text(df["representative"]),
+    })
+    dates = parse_dates(df["date"])
+    frame["date_val"] = dates.dt.strftime("%Y-%m-%d").fillna("")
+    frame["date_filename"] = dates.dt.strftime("%Y%m%d").fillna("")
+    weights = parse_weights(df["weight"])
+    frame["weight"] = format_weights(weights)
+
+    raw_date, raw_weight = clean_text(df["date"]), clean_text(df["weight"])
+    blank = ((frame[["company_name", "address_ko", "representative"]] == "").all(axis=1)
+             & (raw_date == "") & (raw_weight == ""))
+    checks = [
+        (blank, "warning", "row", "blank row", None),
+        (~blank & (frame["company_name"] == ""), "error", "company", "missing store name", df["company"]),
+        (~blank & (frame["address_ko"] == ""), "error", "address", "missing address", df["address"]),
+        (~blank & dates.isna(), "error", "date", "missing or unreadable date", df["date"]),
+        (~blank & (weights.isna() | (weights < 0)), "error", "weight", "missing or invalid weight", df["weight"]),
+        (~blank & (frame["representative"] == ""), "warning", "representative", "missing representative",
+         df["representative"]),
+    ]
+    problems = pd.concat([
+        pd.DataFrame({"row": frame.loc[mask, "row_number"], "severity": severity, "field": field,
+                      "problem": problem, "value": "" if values is None else values[mask].astype(str)})
+        for mask, severity, field, problem, values in checks if mask.any()
+    ] or [pd.DataFrame(columns=REPORT_COLUMNS)], ignore_index=True)
+    problems = problems.sort_values("row", kind="stable").reset_index(drop=True)
+
+    invalid = set(problems.loc[problems["severity"] == "error", "row"]) | set(frame.loc[blank, "row_number"])
+    valid = frame[~frame["row_number"].isin(invalid)]
+    return valid.to_dict("records"), problems
+
+class ValidationReport:
+    """Collects the problems of a source read chunk by chunk.
+
+    Only the counts are kept; the problem rows are appended to the CSV at path
+    (UTF-8 with BOM so Excel shows the Korean text) as each chunk arrives. The
+    file is created with the first problem, so a clean source leaves none.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.counts = {"rejected_rows": 0, "blank_rows": 0, "warnings": 0}
+        self.entries = 0
+        self._file = None
+        self._failed = False
+
+    def add(self, problems):
+        """Counts and appends one chunk's problems; returns its errors (one row per rejected field)."""
+        errors = problems[problems["severity"] == "error"]
+        blank = problems["problem"] == "blank row"
+        self.counts["rejected_rows"] += int(errors["row"].nunique())
+        self.counts["blank_rows"] += int(blank.sum())
+        self.counts["warnings"] += int(((problems["severity"] == "warning") & ~blank).sum())
+        if len(problems) and not self._failed:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "w", newline="", encoding="utf-8-sig")
+                problems.to_csv(self._file, index=False, header=self.entries == 0)
+                self._file.flush()
+                self.entries += len(problems)
+            except OSError as e:
+                self._failed = True
+                logger.error("Failed to write validation report: %s", e)
+        return errors
+
+    def close(self):
+        """Closes the report; returns its path, or None if nothing was written."""
+        if self._file is None:
+            return None
+        self._file.close()
+        self._file = None
+        if self._failed:
+            return None
+        logger.info("Validation report written: %s (%s entries)", self.path, self.entries)
+        return self.path
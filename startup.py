@@ -0,0 +1,76 @@
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from logger import logger, LOG_DIR
+
+# main.py imports this module first, so this is about when the interpreter handed over to the app
+PROCESS_START = time.perf_counter()
+
+# Imported only after the window is up; any of them already loaded at that point is a startup regression
+HEAVY_MODULES = ("pandas", "openpyxl", "requests", "korean_romanizer")
+APP_MODULES = ("romanization", "enrichment_cache", "address_index", "api_utils", "excel_processor")
+STARTUP_LOG = "startup.jsonl"
+
+class StartupProfiler:
+    """Time-to-first-window and import timings for the GUI, plus the background warm-up.
+
+    The window is built with only tkinter/customtkinter loaded; warm_up() then
+    imports the heavy modules on a daemon thread while the user picks files,
+    timing each one. Each start appends one JSON line to logs/startup.jsonl so
+    regressions are visible across builds.
+    """
+
+    def __init__(self):
+        self.marks = {}
+        self.imports = {}
+        self.early_modules = []
+        self.warm = threading.Event()
+        self._thread = None
+
+    def mark(self, name):
+        self.marks[name] = round((time.perf_counter() - PROCESS_START) * 1000, 1)
+
+    def first_window(self):
+        """Call once the main window is on screen (from the Tk main thread)."""
+        self.mark("first_window")
+        self.early_modules = [name for name in HEAVY_MODULES if name in sys.modules]
+        if self.early_modules:
+            logger.warning("Startup: %s imported before the first window; startup is slower than it needs to be",
+                           ", ".join(self.early_modules))
+        logger.info("Startup: first window after %s ms (frozen=%s)", self.marks["first_window"],
+                    getattr(sys, "frozen", False))
+
+    def warm_up(self):
+        """Imports the heavy modules on a background thread; warm is set when they are ready."""
+        self._thread = threading.Thread(target=self._warm_up, name="warm-up", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _warm_up(self):
+        try:
+            for name in HEAVY_MODULES + APP_MODULES:
+                started = time.perf_counter()
+                importlib.import_module(name)
+                self.imports[name] = round((time.perf_counter() - started) * 1000, 1)
+            self.mark("warm")
+            logger.info("Startup: warm-up finished after %s ms (%s)", self.marks["warm"],
+                        ", ".join(f"{name} {ms} ms" for name, ms in self.imports.items()))
+        except Exception as e:
+            # The run imports the same modules again and reports the error properly
+            logger.error("Startup warm-up failed: %s", e)
+        finally:
+            self.warm.set()
+            self._record()
+
+    def _record(self):
+        entry = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "frozen": bool(getattr(sys, "frozen", False)),
+                 "marks_ms": self.marks, "imports_ms": self.imports, "early_modules": self.early_modules}
+        try:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            with open(os.path.join(LOG_DIR, STARTUP_LOG), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            logger.debug("Could not record startup timings: %s", e)
@@ -0,0 +1,102 @@
+"""Render regressions, run against the synthetic form from benchmarks/fixtures.py.
+
+Run with: python -m pytest
+"""
+import io
+import zipfile
+
+import openpyxl
+import pytest
+
+from benchmarks.fixtures import make_form, make_signatures
+from excel_processor import ExcelHandler
+from form_template import FormTemplate
+from xml_render import XmlFormRenderer
+
+SAMPLE_RECORD = {
+    "company_name": "샘플상점", "company_name_en": "Saempeulsangjeom",
+    "address_ko": "서울특별시 중구 세종대로 110", "address_en": "110 Sejong-daero, Jung-gu, Seoul",
+    "zip_code": "04524", "phone": "02-120", "date_val": "2024-01-01", "date_filename": "20240101",
+    "weight": "10", "representative": "홍길동",
+}
+
+@pytest.fixture
+def form_path(tmp_path):
+    path = str(tmp_path / "form.xlsx")
+    make_form(path)
+    return path
+
+def _render_sample(template, wb):
+    template.fill(FormTemplate.target_sheet(wb), SAMPLE_RECORD)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf
+
+def _zip_members(buf):
+    # docProps/core.xml carries the save timestamp, so it is excluded from the comparison
+    with zipfile.ZipFile(buf) as z:
+        return {name: z.read(name) for name in z.namelist() if name != "docProps/core.xml"}
+
+def test_template_clone_matches_load_workbook(form_path):
+    """A cloned template must render identically to a per-row load_workbook."""
+    template = FormTemplate(form_path)
+    loaded = _zip_members(_render_sample(template, openpyxl.load_workbook(form_path)))
+    # Render twice from the same cache to make sure clones do not share state
+    _render_sample(template, template.new_workbook())
+    cloned = _zip_members(_render_sample(template, template.new_workbook()))
+
+    assert sorted(cloned) == sorted(loaded)
+    assert [name for name in loaded if loaded[name] != cloned[name]] == []
+
+def _sheet_facts(buf):
+    """Values, merges, borders and image anchors of every sheet, as read back by openpyxl."""
+    wb = openpyxl.load_workbook(buf)
+    facts = {}
+    for ws in wb.worksheets:
+        cells = {}
+        for row in ws.iter_rows():
+            for cell in row:
+                sides = tuple((side.style, side.color.rgb if side.color is not None else None) if side else (None, None)
+                              for side in (cell.border.left, cell.border.right, cell.border.top, cell.border.bottom))
+                cells[cell.coordinate] = (cell.value, sides)
+        anchors = [(img.anchor._from.col, img.anchor._from.row, img.anchor._from.colOff, img.anchor._from.rowOff)
+                   for img in ws._images]
+        facts[ws.title] = {"cells": cells, "merged": sorted(r.coord for r in ws.merged_cells.ranges),
+                           "images": anchors}
+    return facts
+
+@pytest.mark.parametrize("with_signature", [False, True])
+def test_xml_engine_matches_openpyxl(form_path, tmp_path, with_signature):
+    """The XML engine's output must read back like the openpyxl engine's (cells, merges, borders, signature)."""
+    signature_dir = None
+    if with_signature:
+        signature_dir = str(tmp_path / "signatures")
+        make_signatures(signature_dir, count=1)
+    handler = ExcelHandler(None, form_path, signature_dir, None)
+    wb = handler.template.new_workbook()
+    ws = FormTemplate.target_sheet(wb)
+    handler.template.fill(ws, SAMPLE_RECORD)
+    signature_png = None
+    if with_signature:
+        handler._add_signature(ws, 0)
+        signature_png = handler.signatures.images[0][1]
+    expected = io.BytesIO()
+    wb.save(expected)
+
+    actual = io.BytesIO(XmlFormRenderer(form_path).render(SAMPLE_RECORD, signature_png))
+    with zipfile.ZipFile(actual) as z:
+        assert z.testzip() is None
+
+    expected, actual = _sheet_facts(expected), _sheet_facts(actual)
+    assert sorted(actual) == sorted(expected)
+    assert bool(expected["CORSIA"]["images"]) == with_signature
+    # Cells openpyxl did not materialise read back as empty/borderless
+    empty = (None, ((None, None),) * 4)
+    for title, want in expected.items():
+        got = actual[title]
+        assert got["merged"] == want["merged"]
+        assert got["images"] == want["images"]
+        mismatched = {coord: (want["cells"].get(coord, empty), got["cells"].get(coord, empty))
+                      for coord in set(want["cells"]) | set(got["cells"])
+                      if want["cells"].get(coord, empty) != got["cells"].get(coord, empty)}
+        assert mismatched == {}
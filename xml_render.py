@@ -0,0 +1,439 @@
+import posixpath
+import re
+import struct
+import zipfile
+import zlib
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+from logger import logger
+from form_template import FIELD_MAP, BORDER_FIXES
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+NS_XDR = "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing"
+NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+REL_DRAWING = NS_REL + "/drawing"
+REL_IMAGE = NS_REL + "/image"
+CT_DRAWING = "application/vnd.openxmlformats-officedocument.drawing+xml"
+
+# Signature placement, same as ExcelHandler._add_signature: E22 + (10pt, 3pt), 200x33 px
+SIGNATURE_ANCHOR = {"col": 4, "col_off": 10 * 12700, "row": 21, "row_off": 3 * 12700,
+                    "cx": 200 * 9525, "cy": 33 * 9525}
+
+# Worksheet children that must come after <drawing> (CT_Worksheet sequence)
+_AFTER_DRAWING = re.compile(r"<(?:legacyDrawing|legacyDrawingHF|drawingHF|picture|oleObjects|controls|"
+                            r"webPublishItems|tableParts|extLst)\b|</worksheet>")
+_ROW_RE = re.compile(r"<row\b[^>]*?(?:/>|>.*?</row>)", re.S)
+_CELL_RE = re.compile(r"<c\b[^>]*?(?:/>|>.*?</c>)", re.S)
+_ATTR_RE = re.compile(r'([\w:]+)="([^"]*)"')
+_COORD_RE = re.compile(r"([A-Z]+)(\d+)$")
+_BORDER_SIDES = ("left", "right", "top", "bottom", "diagonal", "vertical", "horizontal")
+# Strips characters XML 1.0 cannot carry (openpyxl raises on them instead)
+_ILLEGAL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+
+def _attrs(tag):
+    return dict(_ATTR_RE.findall(tag[:tag.index(">") + 1]))
+
+def _column_index(letters):
+    index = 0
+    for ch in letters:
+        index = index * 26 + ord(ch) - 64
+    return index
+
+def _split_coord(coord):
+    letters, row = _COORD_RE.match(coord).groups()
+    return _column_index(letters), int(row)
+
+def _resolve_target(base_part, target):
+    """Part name for a relationship target relative to base_part (both without a leading slash)."""
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_part), target))
+
+def _rels_path(part):
+    return posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+
+def _relative(from_part, to_part):
+    return posixpath.relpath(to_part, posixpath.dirname(from_part))
+
+def _next_rel_id(rels_xml):
+    used = {int(n) for n in re.findall(r'Id="rId(\d+)"', rels_xml or "")}
+    return f"rId{max(used, default=0) + 1}"
+
+def _add_relationship(rels_xml, rel_id, rel_type, target):
+    rel = f'<Relationship Id="{rel_id}" Type="{rel_type}" Target="{target}"/>'
+    if rels_xml is None:
+        return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<Relationships xmlns="{NS_PKG_REL}">{rel}</Relationships>')
+    return rels_xml.replace("</Relationships>", rel + "</Relationships>", 1)
+
+def _unused_name(names, pattern):
+    n = 1
+    while pattern.format(n) in names:
+        n += 1
+    return pattern.format(n)
+
+def _anchor_xml(pic_id, rel_id, standalone):
+    a = SIGNATURE_ANCHOR
+    # Namespaces are declared on the anchor itself when it goes into an existing
+    # drawing, so it does not depend on the prefixes that drawing happens to use
+    ns = "" if standalone else f' xmlns:xdr="{NS_XDR}" xmlns:a="{NS_A}" xmlns:r="{NS_REL}"'
+    return (f'<xdr:oneCellAnchor{ns}><xdr:from><xdr:col>{a["col"]}</xdr:col><xdr:colOff>{a["col_off"]}</xdr:colOff>'
+            f'<xdr:row>{a["row"]}</xdr:row><xdr:rowOff>{a["row_off"]}</xdr:rowOff></xdr:from>'
+            f'<xdr:ext cx="{a["cx"]}" cy="{a["cy"]}"/><xdr:pic><xdr:nvPicPr>'
+            f'<xdr:cNvPr id="{pic_id}" name="Signature {pic_id}" descr="Picture"/><xdr:cNvPicPr/></xdr:nvPicPr>'
+            f'<xdr:blipFill><a:blip r:embed="{rel_id}" cstate="print"/><a:stretch><a:fillRect/></a:stretch>'
+            f'</xdr:blipFill><xdr:spPr><a:prstGeom prst="rect"/></xdr:spPr></xdr:pic><xdr:clientData/>'
+            f'</xdr:oneCellAnchor>')
+
+class XmlFormRenderer:
+    """Fills the form by patching its XML directly instead of going through openpyxl.
+
+    At construction the form is read as a zip: only the package/workbook
+    relationships, the target sheet and styles.xml are parsed. The sheet XML is
+    compiled into static text with one slot per FIELD_MAP cell, the BORDER_FIXES
+    become new cellXfs entries, and the signature drawing parts are prepared.
+    render() then joins the slots with the row's values (inline strings, so
+    sharedStrings.xml is untouched) and copies every other member's compressed
+    bytes verbatim. Forms this cannot handle raise ValueError.
+    """
+
+    def __init__(self, form_path):
+        self.form_path = form_path
+        with open(form_path, "rb") as f:
+            self.raw_bytes = f.read()
+
+        with zipfile.ZipFile(form_path) as z:
+            infos = [i for i in z.infolist() if not i.is_dir()]
+            if any(i.flag_bits & 0x1 for i in infos):
+                raise ValueError("Encrypted form members are not supported")
+            self._names = {i.filename for i in infos}
+            self._infos = infos
+
+            def read(name):
+                return z.read(name).decode("utf-8") if name in self._names else None
+
+            self.sheet_part = self._find_target_sheet(read)
+            styles_part = self._find_part(read, self._workbook_part, NS_REL + "/styles")
+            sheet_xml = read(self.sheet_part)
+            styles_xml = read(styles_part)
+            sheet_rels_part = _rels_path(self.sheet_part)
+            sheet_rels = read(sheet_rels_part)
+            content_types = read("[Content_Types].xml")
+
+            self.merged_roots = self._merged_roots(sheet_xml)
+            fill_plan = [(self.merged_roots.get(coord, coord), fmt) for coord, fmt in FIELD_MAP]
+            styles_xml, restyled = self._compile_border_fixes(sheet_xml, styles_xml)
+            self._segments, self._slot_formats = self._compile_sheet(sheet_xml, fill_plan, restyled)
+
+            # Replacement text for patched members; the signature variant adds drawing parts
+            self._plain = {self.sheet_part: None, styles_part: styles_xml.encode("utf-8")}
+            self._signed = dict(self._plain)
+            self._signed_tail = None  # last sheet segment with a <drawing> element, if one is added
+            self._media_part = self._compile_signature(read, sheet_rels_part, sheet_rels, content_types)
+
+            self._raw = {i.filename: self._raw_member(i) for i in infos}
+
+        logger.info("XML render engine compiled: sheet %s, %s fields, %s border fixes",
+                    self.sheet_part, len(self._slot_formats), len(BORDER_FIXES))
+
+    # ---- compile ------------------------------------------------------
+
+    def _find_part(self, read, source_part, rel_type):
+        rels = ElementTree.fromstring(read(_rels_path(source_part)) or "<Relationships/>")
+        for rel in rels:
+            if rel.get("Type") == rel_type:
+                return _resolve_target(source_part, rel.get("Target"))
+        raise ValueError(f"No {rel_type.rsplit('/', 1)[-1]} part referenced from {source_part}")
+
+    def _find_target_sheet(self, read):
+        """Same choice as FormTemplate.target_sheet: the CORSIA sheet, else the active one."""
+        workbook_part = self._find_part(read, "", NS_REL + "/officeDocument")
+        self._workbook_part = workbook_part
+        workbook = ElementTree.fromstring(read(workbook_part))
+        sheets = workbook.findall(f"{{{NS_MAIN}}}sheets/{{{NS_MAIN}}}sheet")
+        view = workbook.find(f"{{{NS_MAIN}}}bookViews/{{{NS_MAIN}}}workbookView")
+        active = int(view.get("activeTab", 0)) if view is not None else 0
+        sheet = next((s for s in sheets if s.get("name") == "CORSIA"), None)
+        if sheet is None:
+            sheet = sheets[min(active, len(sheets) - 1)]
+        rel_id = sheet.get(f"{{{NS_REL}}}id")
+        rels = ElementTree.fromstring(read(_rels_path(workbook_part)))
+        target = next(rel.get("Target") for rel in rels if rel.get("Id") == rel_id)
+        return _resolve_target(workbook_part, target)
+
+    @staticmethod
+    def _merged_roots(sheet_xml):
+        roots = {}
+        for ref in re.findall(r'<mergeCell\b[^>]*\bref="([A-Z]+\d+:[A-Z]+\d+)"', sheet_xml):
+            first, last = ref.split(":")
+            (c1, r1), (c2, r2) = _split_coord(first), _split_coord(last)
+            for row in range(r1, r2 + 1):
+                for col in range(c1, c2 + 1):
+                    roots[f"{_column_letter(col)}{row}"] = first
+        return roots
+
+    def _compile_border_fixes(self, sheet_xml, styles_xml):
+        """Appends one border + cellXfs entry per (style, side) fix; returns (styles_xml, {coord: new style})."""
+        borders_match = re.search(r"<borders\b[^>]*?(?:/>|>(.*?)</borders>)", styles_xml, re.S)
+        xfs_match = re.search(r"<cellXfs\b[^>]*?(?:/>|>(.*?)</cellXfs>)", styles_xml, re.S)
+        if not borders_match or not xfs_match:
+            raise ValueError("styles.xml has no borders/cellXfs table")
+        borders = re.findall(r"<border\b[^>]*?(?:/>|>.*?</border>)", borders_match.group(1) or "", re.S)
+        xfs = re.findall(r"<xf\b[^>]*?(?:/>|>.*?</xf>)", xfs_match.group(1) or "", re.S)
+        cells = self._cells_by_coord(sheet_xml)
+
+        new_borders, new_xfs, restyled, by_fix = [], [], {}, {}
+        for coord, side in BORDER_FIXES:
+            cell = cells.get(coord)
+            style = int(_attrs(cell).get("s", 0)) if cell else 0
+            if (style, side) not in by_fix:
+                xf = xfs[style]
+                border = borders[int(_attrs(xf).get("borderId", 0))]
+                new_borders.append(self._with_thin_side(border, side))
+                xf_id = len(borders) + len(new_borders) - 1
+                new_xfs.append(self._with_border(xf, xf_id))
+                by_fix[(style, side)] = len(xfs) + len(new_xfs) - 1
+            restyled[coord] = by_fix[(style, side)]
+
+        def extend(xml, match, tag, items, existing):
+            body = (match.group(1) or "") + "".join(items)
+            open_tag = re.sub(r'\bcount="\d+"', f'count="{existing + len(items)}"', match.group(0).split(">", 1)[0])
+            if open_tag.endswith("/"):
+                open_tag = open_tag[:-1]
+            if "count=" not in open_tag:
+                open_tag += f' count="{existing + len(items)}"'
+            return xml[:match.start()] + f"{open_tag}>{body}</{tag}>" + xml[match.end():]
+
+        # cellXfs comes after borders, so patch it first to keep borders_match offsets valid
+        styles_xml = extend(styles_xml, xfs_match, "cellXfs", new_xfs, len(xfs))
+        styles_xml = extend(styles_xml, borders_match, "borders", new_borders, len(borders))
+        return styles_xml, restyled
+
+    @staticmethod
+    def _with_thin_side(border, side):
+        # Same colour the openpyxl engine writes (Side(color="000000"))
+        thin = f'<{side} style="thin"><color rgb="00000000"/></{side}>'
+        if border.endswith("/>"):
+            return border[:-2] + f">{thin}</border>"
+        children = {}
+        head, body = border.split(">", 1)
+        body = body[:-len("</border>")]
+        for m in re.finditer(r"<(\w+)\b[^>]*?(?:/>|>.*?</\1>)", body, re.S):
+            children[m.group(1)] = m.group(0)
+        children[side] = thin
+        ordered = [children.pop(name) for name in _BORDER_SIDES if name in children]
+        return f"{head}>{''.join(ordered + list(children.values()))}</border>"
+
+    @staticmethod
+    def _with_border(xf, border_id):
+        head, rest = re.match(r"(<xf\b[^>]*?)(/?>.*)", xf, re.S).groups()
+        head = re.sub(r'\s(?:borderId|applyBorder)="[^"]*"', "", head)
+        return f'{head} borderId="{border_id}" applyBorder="1"{rest}'
+
+    @staticmethod
+    def _cells_by_coord(sheet_xml):
+        return {_attrs(cell).get("r"): cell for cell in _CELL_RE.findall(sheet_xml)}
+
+    def _compile_sheet(self, sheet_xml, fill_plan, restyled):
+        """Splits the sheet XML into static text around one slot per filled cell.
+
+        Returns (segments, slot formats): segments alternates static strings and
+        slot indexes; each slot format is (cell head, format string).
+        """
+        data = re.search(r"<sheetData\b[^>]*?(?:/>|>(.*?)</sheetData>)", sheet_xml, re.S)
+        if data is None:
+            raise ValueError("Sheet has no sheetData")
+        rows = {}
+        for row_xml in _ROW_RE.findall(data.group(1) or ""):
+            row_attrs = _attrs(row_xml)
+            if "r" not in row_attrs:
+                raise ValueError("Rows without an r attribute are not supported")
+            cells = _CELL_RE.findall(row_xml)
+            if any("r" not in _attrs(c) for c in cells):
+                raise ValueError("Cells without an r attribute are not supported")
+            head = row_xml.split(">", 1)[0]
+            rows[int(row_attrs["r"])] = [head.rstrip("/"), {_split_coord(_attrs(c)["r"])[0]: c for c in cells}]
+
+        slots = {}
+        for coord, fmt in fill_plan:
+            slots[coord] = fmt  # a later FIELD_MAP entry for the same cell wins, as with openpyxl
+        for coord in list(slots) + list(restyled):
+            col, row = _split_coord(coord)
+            cells = rows.setdefault(row, [f'<row r="{row}"', {}])[1]
+            cell = cells.get(col, f'<c r="{coord}"/>')
+            if isinstance(cell, tuple):
+                continue
+            if coord in slots:
+                if re.search(r"<f[ >/]", cell):
+                    raise ValueError(f"Cell {coord} holds a formula; the XML engine does not overwrite formulas")
+                style = restyled.get(coord, _attrs(cell).get("s"))
+                cells[col] = (f'<c r="{coord}"' + (f' s="{style}"' if style not in (None, "0") else ""),)
+            else:
+                # Border fix only: keep the cell's content, swap its style
+                head, rest = re.match(r"(<c\b[^>]*?)(/?>.*)", cell, re.S).groups()
+                head = re.sub(r'\ss="[^"]*"', "", head)
+                cells[col] = f'{head} s="{restyled[coord]}"{rest}'
+
+        open_tag = data.group(0).split(">", 1)[0].rstrip("/")
+        text = [sheet_xml[:data.start()] + open_tag + ">"]
+        segments, slot_formats = [], []
+        for row in sorted(rows):
+            head, cells = rows[row]
+            text.append(head + ">" if cells else head + "/>")
+            for col in sorted(cells):
+                cell = cells[col]
+                if isinstance(cell, tuple):
+                    segments.append("".join(text))
+                    segments.append(len(slot_formats))
+                    slot_formats.append((cell[0], slots[_column_letter(col) + str(row)]))
+                    text = []
+                else:
+                    text.append(cell)
+            if cells:
+                text.append("</row>")
+        text.append("</sheetData>" + sheet_xml[data.end():])
+        segments.append("".join(text))
+        return segments, slot_formats
+
+    def _compile_signature(self, read, sheet_rels_part, sheet_rels, content_types):
+        """Prepares the drawing/relationship/content-type members added when a signature is placed."""
+        sheet_tail = self._segments[-1]
+        drawing_ref = re.search(r'<drawing\b[^>]*?\bid="([^"]+)"', sheet_tail)
+        if drawing_ref:
+            # The form already has a drawing: append the signature anchor to it
+            rel = next(r for r in ElementTree.fromstring(sheet_rels) if r.get("Id") == drawing_ref.group(1))
+            drawing_part = _resolve_target(self.sheet_part, rel.get("Target"))
+            drawing_xml = read(drawing_part)
+            drawing_rels_part = _rels_path(drawing_part)
+            drawing_rels = read(drawing_rels_part)
+            image_rel = _next_rel_id(drawing_rels)
+            pic_id = max((int(n) for n in re.findall(r'<(?:\w+:)?cNvPr\b[^>]*?\bid="(\d+)"', drawing_xml)),
+                         default=0) + 1
+            close = drawing_xml.rindex("</")
+            drawing_xml = drawing_xml[:close] + _anchor_xml(pic_id, image_rel, standalone=False) + drawing_xml[close:]
+        else:
+            drawing_part = _unused_name(self._names, "xl/drawings/drawing{}.xml")
+            drawing_rels_part = _rels_path(drawing_part)
+            drawing_rels = None
+            image_rel = "rId1"
+            drawing_xml = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                           f'<xdr:wsDr xmlns:xdr="{NS_XDR}" xmlns:a="{NS_A}" xmlns:r="{NS_REL}">'
+                           f'{_anchor_xml(1, image_rel, standalone=True)}</xdr:wsDr>')
+            sheet_rel = _next_rel_id(sheet_rels)
+            self._signed[sheet_rels_part] = _add_relationship(
+                sheet_rels, sheet_rel, REL_DRAWING, _relative(self.sheet_part, drawing_part)).encode("utf-8")
+            head = sheet_tail[:sheet_tail.index("</sheetData>")]
+            tail = sheet_tail[len(head):]
+            at = _AFTER_DRAWING.search(tail).start()
+            declare = "" if f'xmlns:r="{NS_REL}"' in self._segments[0] else f' xmlns:r="{NS_REL}"'
+            self._signed_tail = head + tail[:at] + f'<drawing{declare} r:id="{sheet_rel}"/>' + tail[at:]
+            content_types = content_types.replace(
+                "</Types>", f'<Override PartName="/{drawing_part}" ContentType="{CT_DRAWING}"/></Types>', 1)
+
+        media_part = _unused_name(self._names, "xl/media/image{}.png")
+        if not re.search(r'<Default\b[^>]*\bExtension="png"', content_types, re.I):
+            content_types = content_types.replace(
+                "</Types>", '<Default Extension="png" ContentType="image/png"/></Types>', 1)
+        self._signed[drawing_part] = drawing_xml.encode("utf-8")
+        self._signed[drawing_rels_part] = _add_relationship(
+            drawing_rels, image_rel, REL_IMAGE, _relative(drawing_part, media_part)).encode("utf-8")
+        self._signed["[Content_Types].xml"] = content_types.encode("utf-8")
+        return media_part
+
+    def _raw_member(self, info):
+        """(header fields, compressed bytes) of a form member, read straight from the archive."""
+        fields = _LOCAL_HEADER.unpack_from(self.raw_bytes, info.header_offset)
+        start = info.header_offset + _LOCAL_HEADER.size + fields[10] + fields[11]
+        data = self.raw_bytes[start:start + info.compress_size]
+        if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise ValueError(f"Unsupported compression for {info.filename}")
+        return (info.compress_type, info.CRC, info.compress_size, info.file_size, info.date_time), data
+
+    # ---- render -------------------------------------------------------
+
+    def _sheet_xml(self, record, signed):
+        parts = []
+        for segment in self._segments[:-1]:
+            if isinstance(segment, int):
+                head, fmt = self._slot_formats[segment]
+                value = _ILLEGAL_XML.sub("", fmt.format(**record))
+                if value:
+                    parts.append(f'{head} t="inlineStr"><is><t xml:space="preserve">{escape(value)}</t></is></c>')
+                else:
+                    parts.append(head + "/>")
+            else:
+                parts.append(segment)
+        parts.append(self._signed_tail if signed and self._signed_tail else self._segments[-1])
+        return "".join(parts).encode("utf-8")
+
+    def render(self, record, signature_png=None):
+        """Returns the .xlsx bytes for one record, with the signature image if given."""
+        signed = signature_png is not None
+        replaced = dict(self._signed if signed else self._plain)
+        replaced[self.sheet_part] = self._sheet_xml(record, signed)
+        if signed:
+            replaced[self._media_part] = signature_png
+
+        writer = _ZipWriter()
+        for info in self._infos:
+            name = info.filename
+            if name in replaced:
+                writer.add(name, replaced.pop(name), info.date_time)
+            else:
+                writer.add_raw(name, *self._raw[name])
+        date_time = self._infos[0].date_time
+        for name, data in replaced.items():
+            # PNG data is already compressed; deflating it again only costs time
+            writer.add(name, data, date_time, compress=not name.endswith(".png"))
+        return writer.finish()
+
+class _ZipWriter:
+    """Minimal in-memory zip writer that can take already-compressed member data."""
+
+    def __init__(self):
+        self._chunks = []
+        self._central = []
+        self._offset = 0
+
+    def add(self, name, data, date_time, compress=True):
+        if compress:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            packed = compressor.compress(data) + compressor.flush()
+            method = zipfile.ZIP_DEFLATED
+        else:
+            packed, method = data, zipfile.ZIP_STORED
+        self.add_raw(name, (method, zlib.crc32(data), len(packed), len(data), date_time), packed)
+
+    def add_raw(self, name, fields, packed):
+        method, crc, compress_size, file_size, date_time = fields
+        encoded = name.encode("utf-8")
+        flags = 0x800 if not name.isascii() else 0
+        dos_time = date_time[3] << 11 | date_time[4] << 5 | date_time[5] // 2
+        dos_date = (date_time[0] - 1980) << 9 | date_time[1] << 5 | date_time[2]
+        self._chunks.append(_LOCAL_HEADER.pack(b"PK\x03\x04", 20, 0, flags, method, dos_time, dos_date,
+                                               crc, compress_size, file_size, len(encoded), 0))
+        self._chunks.append(encoded)
+        self._chunks.append(packed)
+        self._central.append(_CENTRAL_HEADER.pack(b"PK\x01\x02", 20, 0, 20, 0, flags, method, dos_time, dos_date,
+                                                  crc, compress_size, file_size, len(encoded), 0, 0, 0, 0, 0,
+                                                  self._offset) + encoded)
+        self._offset += _LOCAL_HEADER.size + len(encoded) + compress_size
+
+    def finish(self):
+        central = b"".join(self._central)
+        count = len(self._central)
+        end = _END_RECORD.pack(b"PK\x05\x06", 0, 0, count, count, len(central), self._offset, 0)
+        return b"".join(self._chunks) + central + end
+
+def _column_letter(index):
+    letters = ""
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters